@@ -1,28 +1,40 @@
 
 import os
-import pandas as pd
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 from datetime import datetime
+from typing import Optional
+
+from outputs_io import output_exists, read_output_cached
 
 OUT_DIR = os.environ.get("OUT_DIR", "/mnt/data/model_outputs")
 CLEAN = os.path.join(OUT_DIR, "clean_timeseries.csv")
 SUMMARY = os.path.join(OUT_DIR, "rising_diseases.csv")
+SUMMARY_BY_H = os.path.join(OUT_DIR, "rising_diseases_by_horizon.csv")
 
 app = FastAPI(title="Disease Mention Forecast API")
 
 @app.get("/rising")
-def rising():
-    if not os.path.exists(SUMMARY):
+def rising(days: Optional[int] = None):
+    # ?days=H looks up that horizon in the multi-horizon output
+    if days is not None:
+        if not output_exists(SUMMARY_BY_H):
+            raise HTTPException(404, "Run pipeline_train.py first")
+        df = read_output_cached(SUMMARY_BY_H)
+        df = df[df["horizon_days"] == days].drop(columns="horizon_days")
+        if df.empty:
+            raise HTTPException(404, f"No {days}-day forecast; run pipeline_train.py --days {days}")
+        return JSONResponse(df.to_dict(orient="records"))
+    if not output_exists(SUMMARY):
         raise HTTPException(404, "Run pipeline_train.py first")
-    df = pd.read_csv(SUMMARY)
+    df = read_output_cached(SUMMARY)
     return JSONResponse(df.to_dict(orient="records"))
 
 @app.get("/forecast/{disease}")
 def forecast(disease: str):
-    if not os.path.exists(CLEAN):
+    if not output_exists(CLEAN):
         raise HTTPException(404, "Run pipeline_train.py first")
-    df = pd.read_csv(CLEAN, parse_dates=["date"])
+    df = read_output_cached(CLEAN, parse_dates=["date"])
     sub = df[df["disease_name"].str.lower()==disease.lower()].sort_values("date")
     if sub.empty:
         raise HTTPException(404, f"No data for disease '{disease}'")
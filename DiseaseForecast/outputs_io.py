@@ -0,0 +1,115 @@
+"""
+Read/write helpers for pipeline outputs.
+
+Outputs are addressed by their CSV path (e.g. OUT_DIR/forecasts.csv). With
+OUTPUT_FORMAT=parquet the pipelines write a typed Parquet file with the same
+name instead (forecasts.parquet): dates stay timestamps and disease_name /
+country are stored as categoricals, so readers skip CSV and date parsing.
+Readers take whichever of the two files is newer, so switching formats
+never serves a stale copy.
+
+read_output_cached() keeps parsed frames in process memory keyed by file,
+mtime and size, so dashboards re-parse an output only after the pipeline
+rewrites it.
+"""
+import os
+import threading
+import importlib.util
+from collections import OrderedDict
+
+import pandas as pd
+
+OUTPUT_FORMAT = os.environ.get("OUTPUT_FORMAT", "csv").lower()  # csv | parquet
+CATEGORICAL_COLUMNS = ["disease_name", "country"]
+
+HAS_PARQUET = any(importlib.util.find_spec(m) for m in ("pyarrow", "fastparquet"))
+
+# parsed frames kept by read_output_cached (least recently used dropped first)
+READ_CACHE_MAX_ENTRIES = int(os.environ.get("READ_CACHE_MAX_ENTRIES", "32"))
+_read_cache = OrderedDict()
+_read_cache_lock = threading.Lock()
+
+
+def parquet_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def output_path(path: str):
+    """the file currently holding an output (newer of .parquet / .csv), or None"""
+    candidates = [p for p in (parquet_path(path), path) if os.path.exists(p)]
+    if not HAS_PARQUET:
+        candidates = [p for p in candidates if not p.endswith(".parquet")]
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+
+def output_exists(path: str) -> bool:
+    return output_path(path) is not None
+
+
+def output_mtime(path: str) -> float:
+    found = output_path(path)
+    return os.path.getmtime(found) if found else 0
+
+
+def write_output(df: pd.DataFrame, path: str, fmt: str = None) -> str:
+    """write `df` as OUTPUT_FORMAT (CSV when no Parquet engine is installed); returns the file written"""
+    fmt = fmt or OUTPUT_FORMAT
+    if fmt == "parquet" and HAS_PARQUET:
+        df = df.copy()
+        for col in CATEGORICAL_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype("category")
+        target = parquet_path(path)
+        df.to_parquet(target, index=False)
+        return target
+    if fmt == "parquet":
+        print("⚠️ OUTPUT_FORMAT=parquet but pyarrow/fastparquet is not installed; writing CSV.")
+    df.to_csv(path, index=False)
+    return path
+
+
+def read_output(path: str, parse_dates=None, **read_kw) -> pd.DataFrame:
+    """read an output by its CSV path; `parse_dates` / `read_kw` only apply to CSV"""
+    found = output_path(path)
+    if found is None:
+        raise FileNotFoundError(path)
+    if found.endswith(".parquet"):
+        return pd.read_parquet(found)
+    return pd.read_csv(found, parse_dates=parse_dates, **read_kw)
+
+
+def output_signature(path: str):
+    """(file, mtime_ns, size) of the file currently holding an output, or None"""
+    found = output_path(path)
+    if found is None:
+        return None
+    st = os.stat(found)
+    return found, st.st_mtime_ns, st.st_size
+
+
+def read_output_cached(path: str, parse_dates=None, **read_kw) -> pd.DataFrame:
+    """
+    read_output, memoized per process by the file's signature and the read
+    arguments; shared by all callers (e.g. every Streamlit session). Returns
+    a copy, so callers may modify it freely.
+    """
+    signature = output_signature(path)
+    if signature is None:
+        raise FileNotFoundError(path)
+    key = (signature, repr(parse_dates), repr(sorted(read_kw.items())))
+    with _read_cache_lock:
+        df = _read_cache.get(key)
+        if df is not None:
+            _read_cache.move_to_end(key)
+    if df is None:
+        df = read_output(signature[0], parse_dates=parse_dates, **read_kw)
+        with _read_cache_lock:
+            # drop older versions of the same file, then the least recently used
+            for old in [k for k in _read_cache if k[0][0] == signature[0] and k[0] != signature]:
+                del _read_cache[old]
+            _read_cache[key] = df
+            while len(_read_cache) > READ_CACHE_MAX_ENTRIES:
+                _read_cache.popitem(last=False)
+    return df.copy()
@@ -1,7 +1,11 @@
-import os, re, time, argparse
+import os, re, json, time, argparse
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from outputs_io import write_output
+from snapshots import SnapshotStore
 
 # Try statsmodels; fall back gracefully
 try:
@@ -15,33 +19,50 @@ INPUT = os.environ.get("ARTICLES_CSV", "./articles.csv")
 OUT_DIR = os.environ.get("OUT_DIR", "./outputs")
 os.makedirs(OUT_DIR, exist_ok=True)
 
-# ------------------ Read & normalize ------------------
-df = pd.read_csv(INPUT)
+# per-disease model fits in worker processes (1 = serial); a pool is only
+# started when at least this many series need a Holt-Winters fit
+FORECAST_WORKERS = int(os.environ.get("FORECAST_WORKERS", "1"))
+FORECAST_PARALLEL_MIN_SERIES = int(os.environ.get("FORECAST_PARALLEL_MIN_SERIES", "4"))
 
+# warm-start cache of Holt-Winters parameters per disease (reused as starting
+# values instead of the brute-force grid); a series is refitted from scratch when
+# its start date / seasonality changes, its history shrinks or grows by more than
+# HW_CACHE_MAX_NEW_DAYS, or the warm fit's residual std drifts > HW_CACHE_MAX_DRIFT;
+# both measured against the last cold fit (warm fits only update start_params)
+HW_CACHE_PATH = os.path.join(OUT_DIR, "hw_param_cache.json")
+HW_CACHE_MAX_NEW_DAYS = int(os.environ.get("HW_CACHE_MAX_NEW_DAYS", "14"))
+HW_CACHE_MAX_DRIFT = float(os.environ.get("HW_CACHE_MAX_DRIFT", "0.2"))
+HW_WARM_TOLERANCE = float(os.environ.get("HW_WARM_TOLERANCE", "0.1"))  # for --check-warm-start
+
+# ------------------ Read & normalize ------------------
 DATE_CANDIDATES = [
     "published_at", "publishedAt", "published_date",
     "date", "created_at", "fetched_at"
 ]
-date_col = next((c for c in DATE_CANDIDATES if c in df.columns), None)
-if not date_col:
-    raise ValueError(f"No date column found. Looked for {DATE_CANDIDATES}. Got {list(df.columns)}")
 
-df[date_col] = pd.to_datetime(df[date_col], errors="coerce", utc=True)
-df[date_col] = df[date_col].dt.tz_convert(None)
-df = df.dropna(subset=[date_col])
+def prepare_articles(df: pd.DataFrame):
+    """pick the date column, drop undated rows, build full_text; returns (df, date_col)"""
+    date_col = next((c for c in DATE_CANDIDATES if c in df.columns), None)
+    if not date_col:
+        raise ValueError(f"No date column found. Looked for {DATE_CANDIDATES}. Got {list(df.columns)}")
 
-# ensure text columns exist
-for col in ["title", "description", "content", "source", "keywords"]:
-    if col not in df.columns:
-        df[col] = ""
+    df[date_col] = pd.to_datetime(df[date_col], errors="coerce", utc=True)
+    df[date_col] = df[date_col].dt.tz_convert(None)
+    df = df.dropna(subset=[date_col])
 
-df["full_text"] = (
-    df["title"].astype(str) + " " +
-    df["description"].astype(str) + " " +
-    df["content"].astype(str)
-)
+    # ensure text columns exist
+    for col in ["title", "description", "content", "source", "keywords"]:
+        if col not in df.columns:
+            df[col] = ""
 
-print(f"✅ Using date column: {date_col} | rows: {len(df)}")
+    df["full_text"] = (
+        df["title"].astype(str) + " " +
+        df["description"].astype(str) + " " +
+        df["content"].astype(str)
+    )
+
+    print(f"✅ Using date column: {date_col} | rows: {len(df)}")
+    return df, date_col
 
 # ------------------ Disease patterns ------------------
 PATTERNS = {
@@ -55,61 +76,76 @@ PATTERNS = {
     r"\btuberculosis\b|\btb\b": "Tuberculosis",
     r"\bmeningitis\b": "Meningitis",
 }
-COMPILED = [(re.compile(p, re.I), name) for p, name in PATTERNS.items()]
+# one alternation with a named group per disease: a single scan per text,
+# match.lastgroup tells which disease hit
+DISEASE_RX = re.compile("|".join(f"(?P<d{i}>{p})" for i, p in enumerate(PATTERNS)), re.I)
+GROUP_TO_DISEASE = {f"d{i}": n for i, n in enumerate(PATTERNS.values())}
+DISEASE_ORDER = list(PATTERNS.values())
 # map for keyword fallback
 KEYWORD_MAP = {n.lower(): n for n in set(PATTERNS.values())}
 
 # ------------------ Extract mentions ------------------
-rows = []
-for i, r in df.iterrows():
-    txt = str(r["full_text"])
-    # regex hits
-    hit = False
-    for rgx, name in COMPILED:
-        m = rgx.findall(txt)
-        if m:
-            rows.append({
-                "article_id": i,
-                "date": pd.to_datetime(r[date_col]).normalize(),
-                "disease_name": name,
-                "mention_count": len(m),
-                "source": r["source"],
-            })
-            hit = True
+def extract_mentions(df: pd.DataFrame, date_col: str) -> pd.DataFrame:
+    """
+    One row per (article, disease) with its mention count, computed
+    column-wise: regex matches via str.extractall, keyword fallback via
+    explode for articles without any regex hit
+    """
+    columns = ["article_id", "date", "disease_name", "mention_count", "source"]
+    pos = pd.Series(np.arange(len(df)), index=df.index)
+
+    # regex hits (one named group is set per match: that's the disease)
+    matches = df["full_text"].astype(str).str.extractall(DISEASE_RX)
+    if len(matches):
+        hits = pd.DataFrame({
+            "row": matches.index.get_level_values(0),
+            "disease_name": matches.columns[matches.notna().to_numpy().argmax(axis=1)].map(GROUP_TO_DISEASE),
+        })
+        regex_counts = hits.groupby(["row", "disease_name"], sort=False).size().rename("mention_count").reset_index()
+        regex_counts["order"] = regex_counts["disease_name"].map({n: k for k, n in enumerate(DISEASE_ORDER)})
+    else:
+        regex_counts = pd.DataFrame(columns=["row", "disease_name", "mention_count", "order"])
 
     # fallback via keywords column (comma/pipe/space separated)
-    if not hit and pd.notna(r["keywords"]) and str(r["keywords"]).strip():
-        toks = re.split(r"[,\|;/\s]+", str(r["keywords"]).lower())
-        seen = {}
-        for t in toks:
-            n = KEYWORD_MAP.get(t.strip())
-            if n:
-                seen[n] = seen.get(n, 0) + 1
-        for name, cnt in seen.items():
-            rows.append({
-                "article_id": i,
-                "date": pd.to_datetime(r[date_col]).normalize(),
-                "disease_name": name,
-                "mention_count": int(cnt),
-                "source": r["source"],
-            })
-
-mentions = pd.DataFrame(rows)
-if mentions.empty:
-    print("⚠️ No disease mentions found from text/keywords.")
-    # Write empty but well-formed files so the app stays consistent
-    pd.DataFrame(columns=["date","disease_name","mention_count","sentiment_score","source_reliability"]).to_csv(
-        os.path.join(OUT_DIR, "clean_timeseries.csv"), index=False)
-    pd.DataFrame(columns=["disease_name","model_used","recent_actual_mean","forecast_next_mean",
-                          "pct_change_vs_recent","is_rising"]).to_csv(
-        os.path.join(OUT_DIR, "rising_diseases.csv"), index=False)
-    pd.DataFrame(columns=["date","disease_name","forecast"]).to_csv(
-        os.path.join(OUT_DIR, "forecasts.csv"), index=False)
-    raise SystemExit(0)
+    kw = df.loc[~df.index.isin(regex_counts["row"]), "keywords"]
+    kw = kw[kw.notna()].astype(str)
+    kw = kw[kw.str.strip() != ""]
+    toks = kw.str.lower().str.split(r"[,\|;/\s]+", regex=True).explode().str.strip()
+    mapped = toks.map(KEYWORD_MAP).dropna()
+    kw_counts = (pd.DataFrame({"row": mapped.index, "disease_name": mapped.to_numpy()})
+                 .groupby(["row", "disease_name"], sort=False).size().rename("mention_count").reset_index())
+    kw_counts["order"] = kw_counts.groupby("row").cumcount()  # first appearance
 
-# ------------------ Aggregate to daily ------------------
-agg = mentions.groupby(["date","disease_name"], as_index=False)["mention_count"].sum()
+    counts = pd.concat([regex_counts, kw_counts], ignore_index=True)
+    if counts.empty:
+        return pd.DataFrame(columns=columns)
+    counts["pos"] = counts["row"].map(pos)
+    counts = counts.sort_values(["pos", "order"], kind="stable")
+
+    rows = df.loc[counts["row"]]
+    return pd.DataFrame({
+        "article_id": counts["row"].to_numpy(),
+        "date": rows[date_col].dt.normalize().to_numpy(),
+        "disease_name": counts["disease_name"].to_numpy(),
+        "mention_count": counts["mention_count"].astype(int).to_numpy(),
+        "source": rows["source"].to_numpy(),
+    }, columns=columns)
 
+def write_empty_outputs():
+    # empty but well-formed files so the app stays consistent
+    write_output(pd.DataFrame(columns=["date","disease_name","mention_count","sentiment_score","source_reliability"]),
+        os.path.join(OUT_DIR, "clean_timeseries.csv"))
+    write_output(pd.DataFrame(columns=["disease_name","model_used","recent_actual_mean","forecast_next_mean",
+                                       "pct_change_vs_recent","is_rising"]),
+        os.path.join(OUT_DIR, "rising_diseases.csv"))
+    write_output(pd.DataFrame(columns=["date","disease_name","forecast"]),
+        os.path.join(OUT_DIR, "forecasts.csv"))
+    write_output(pd.DataFrame(columns=["horizon_days"] + SUMMARY_COLUMNS),
+        os.path.join(OUT_DIR, "rising_diseases_by_horizon.csv"))
+    write_output(pd.DataFrame(columns=["horizon_days","date","disease_name","forecast"]),
+        os.path.join(OUT_DIR, "forecasts_by_horizon.csv"))
+
+# ------------------ Aggregate to daily ------------------
 def fill_daily(g: pd.DataFrame) -> pd.DataFrame:
     g = g.set_index("date").sort_index()
     rng = pd.date_range(g.index.min(), g.index.max(), freq="D")
@@ -118,29 +154,109 @@ def fill_daily(g: pd.DataFrame) -> pd.DataFrame:
     g["mention_count"] = g["mention_count"].astype(float)
     return g.reset_index()
 
-filled = []
-for dis, g in agg.groupby("disease_name"):
-    d = fill_daily(g)
-    d["disease_name"] = dis
-    filled.append(d)
-clean = pd.concat(filled, ignore_index=True)
+def build_daily_series(mentions: pd.DataFrame) -> pd.DataFrame:
+    agg = mentions.groupby(["date","disease_name"], as_index=False)["mention_count"].sum()
+    filled = []
+    for dis, g in agg.groupby("disease_name"):
+        d = fill_daily(g)
+        d["disease_name"] = dis
+        filled.append(d)
+    clean = pd.concat(filled, ignore_index=True)
 
-# basic placeholders (can be replaced later)
-clean["sentiment_score"] = 0.0
-clean["source_reliability"] = 0.5
+    # basic placeholders (can be replaced later)
+    clean["sentiment_score"] = 0.0
+    clean["source_reliability"] = 0.5
+    return clean
 
 # ------------------ Forecasting ------------------
-ap = argparse.ArgumentParser()
-ap.add_argument("--days", type=int, default=7, help="Forecast horizon: 7/14/30/60")
-args = ap.parse_args()
-H = int(args.days)
+def needs_model_fit(g: pd.DataFrame) -> bool:
+    return HAS_SM and len(g) >= 10 and bool((g["mention_count"] > 0).any())
+
+def parse_horizons(value: str) -> list:
+    """'7' or '7,14,30,60' -> list of horizons (duplicates dropped, order kept)"""
+    horizons = []
+    for part in str(value).split(","):
+        if part.strip():
+            h = int(part)
+            if h <= 0:
+                raise argparse.ArgumentTypeError(f"Forecast horizon must be positive: {h}")
+            if h not in horizons:
+                horizons.append(h)
+    if not horizons:
+        raise argparse.ArgumentTypeError("At least one forecast horizon is required")
+    return horizons
+
+def load_hw_cache(path: str = HW_CACHE_PATH) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_hw_cache(cache: dict, path: str = HW_CACHE_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
 
-results = []
-forecast_frames = []
+def residual_std(y, fitted) -> float:
+    sd = float(np.nanstd(y - fitted, ddof=1))
+    return sd if np.isfinite(sd) else 0.0
 
-for dis, g in clean.groupby("disease_name"):
+def warm_start_params(entry, g: pd.DataFrame, seasonal):
+    """starting values from a cache entry, or None if the series must be fitted from scratch"""
+    if not entry or entry.get("seasonal_periods") != seasonal:
+        return None
+    if entry.get("start_date") != g["date"].min().strftime("%Y-%m-%d"):
+        return None
+    new_days = len(g) - int(entry.get("n_obs", 0))
+    if new_days < 0 or new_days > HW_CACHE_MAX_NEW_DAYS:
+        return None
+    return np.asarray(entry["start_params"], dtype=float)
+
+def fit_holt_winters(y, seasonal, start=None, cached_resid_std=None):
+    """warm-started fit when possible, brute-force search otherwise; returns (fit, resid std, fit mode)"""
+    model = ExponentialSmoothing(
+        y, trend="add",
+        seasonal=("add" if seasonal else None),
+        seasonal_periods=seasonal,
+        initialization_method="estimated"
+    )
+    if start is not None:
+        try:
+            m = model.fit(optimized=True, use_brute=False, start_params=start)
+            sd = residual_std(y, m.fittedvalues)
+            if sd <= (cached_resid_std or 0.0) * (1 + HW_CACHE_MAX_DRIFT) + 1e-9:
+                return m, sd, "warm"
+        except Exception:
+            pass
+    m = model.fit(optimized=True, use_brute=True)
+    return m, residual_std(y, m.fittedvalues), "cold"
+
+def hw_cache_entry(m, g: pd.DataFrame, seasonal, resid_std: float, cold_entry=None) -> dict:
+    """fitted parameters in start_params order, plus what invalidates them (kept from cold_entry after a warm fit)"""
+    p = m.params
+    start = [p["smoothing_level"], p["smoothing_trend"]] + ([p["smoothing_seasonal"]] if seasonal else [])
+    start += [p["initial_level"], p["initial_trend"]]
+    if seasonal:
+        start += list(np.asarray(p["initial_seasons"], dtype=float))
+    if cold_entry:
+        return dict(cold_entry, start_params=[float(v) for v in start])
+    return {"start_date": g["date"].min().strftime("%Y-%m-%d"), "n_obs": len(g),
+            "seasonal_periods": seasonal, "start_params": [float(v) for v in start],
+            "resid_std": resid_std}
+
+def forecast_series(dis: str, g: pd.DataFrame, horizons: list, cache_entry=None, check=False):
+    """
+    fit one disease once and forecast max(horizons) days; every horizon is a prefix of that path
+    cache_entry seeds the fit (warm start); with check, warm fits are compared to a cold refit
+    returns ({H: summary row}, {H: forecast frame}, timing row, new cache entry or None)
+    """
+    started = time.perf_counter()
+    H = max(horizons)
     g = g.sort_values("date")
     y = g["mention_count"].astype(float)
+    fit_mode, new_entry, warm_diff, warm_sse_ratio = None, None, None, None
     # guard: if all zeros, keep zeros forward
     if (y > 0).sum() == 0:
         fc = pd.Series([0.0]*H, index=range(H))
@@ -152,16 +268,18 @@ for dis, g in clean.groupby("disease_name"):
         if HAS_SM and len(y) >= 10:
             try:
                 seasonal = 7 if len(y) >= 21 else None
-                m = ExponentialSmoothing(
-                    y, trend="add",
-                    seasonal=("add" if seasonal else None),
-                    seasonal_periods=seasonal,
-                    initialization_method="estimated"
-                ).fit(optimized=True, use_brute=True)
+                m, sd, fit_mode = fit_holt_winters(y, seasonal, warm_start_params(cache_entry, g, seasonal),
+                                                   (cache_entry or {}).get("resid_std"))
                 fc = m.forecast(H)
                 model_used = "Holt-Winters"
+                new_entry = hw_cache_entry(m, g, seasonal, sd, cache_entry if fit_mode == "warm" else None)
+                if check and fit_mode == "warm":
+                    cold, _, _ = fit_holt_winters(y, seasonal)
+                    warm_diff = float(np.max(np.abs(fc.values - cold.forecast(H).values)))
+                    warm_sse_ratio = float(m.sse / cold.sse) if cold.sse > 0 else None  # < 1: warm is better
             except Exception:
                 fc = None
+                fit_mode, new_entry = None, None
         if fc is None:
             # fallback: 7-day moving average
             ma = y.rolling(7, min_periods=1).mean().iloc[-1]
@@ -172,43 +290,130 @@ for dis, g in clean.groupby("disease_name"):
     fc = np.clip(fc.values, 0.0, None)
 
     future_dates = pd.date_range(g["date"].max() + timedelta(days=1), periods=H, freq="D")
-    forecast_frames.append(pd.DataFrame({
-        "date": future_dates,
-        "disease_name": dis,
-        "forecast": fc
-    }))
-
     recent_mean = float(y.tail(7).mean()) if len(y) else 0.0
-    next_mean = float(np.mean(fc))
-    pct = (next_mean - recent_mean)/recent_mean if recent_mean > 0 else (1.0 if next_mean > 0 else 0.0)
-    results.append({
-        "disease_name": dis,
-        "model_used": model_used,
-        "recent_actual_mean": round(recent_mean, 3),
-        "forecast_next_mean": round(next_mean, 3),
-        "pct_change_vs_recent": round(pct, 3),
-        "is_rising": bool(pct > 0.15)
-    })
+    results, frames = {}, {}
+    for h in horizons:
+        frames[h] = pd.DataFrame({
+            "date": future_dates[:h],
+            "disease_name": dis,
+            "forecast": fc[:h]
+        })
+        next_mean = float(np.mean(fc[:h]))
+        pct = (next_mean - recent_mean)/recent_mean if recent_mean > 0 else (1.0 if next_mean > 0 else 0.0)
+        results[h] = {
+            "disease_name": dis,
+            "model_used": model_used,
+            "recent_actual_mean": round(recent_mean, 3),
+            "forecast_next_mean": round(next_mean, 3),
+            "pct_change_vs_recent": round(pct, 3),
+            "is_rising": bool(pct > 0.15)
+        }
+    timing = {"disease_name": dis, "model_used": model_used, "n_obs": len(y), "fit_mode": fit_mode,
+              "fit_seconds": round(time.perf_counter() - started, 4),
+              "warm_max_abs_diff": warm_diff, "warm_sse_vs_cold": warm_sse_ratio}
+    return results, frames, timing, new_entry
+
+def forecast_all(clean: pd.DataFrame, horizons: list, workers: int = FORECAST_WORKERS,
+                 hw_cache=None, check=False):
+    """
+    fit every disease (in a process pool when it pays off), keeping the sorted disease order
+    returns ({H: results}, {H: forecast frames}, timings, new hw_cache)
+    """
+    series = [(dis, g) for dis, g in clean.groupby("disease_name")]
+    entries = [(hw_cache or {}).get(dis) for dis, _ in series]
+    if workers > 1 and sum(needs_model_fit(g) for _, g in series) >= FORECAST_PARALLEL_MIN_SERIES:
+        print(f"⚙️ Fitting {len(series)} series on {workers} worker processes…")
+        with ProcessPoolExecutor(max_workers=min(workers, len(series))) as pool:
+            outputs = list(pool.map(forecast_series, [d for d, _ in series], [g for _, g in series],
+                                    [horizons]*len(series), entries, [check]*len(series)))
+    else:
+        outputs = [forecast_series(dis, g, horizons, e, check) for (dis, g), e in zip(series, entries)]
+    return ({h: [o[0][h] for o in outputs] for h in horizons},
+            {h: [o[1][h] for o in outputs] for h in horizons},
+            [o[2] for o in outputs],
+            {dis: o[3] for (dis, _), o in zip(series, outputs) if o[3]})
 
 # ------------------ Save outputs (consistent schema) ------------------
-summary = pd.DataFrame(results).sort_values("pct_change_vs_recent", ascending=False)
-forecasts = pd.concat(forecast_frames, ignore_index=True)
-
-# Always write “latest” files the Streamlit app reads
-clean[["date","disease_name","mention_count","sentiment_score","source_reliability"]].to_csv(
-    os.path.join(OUT_DIR, "clean_timeseries.csv"), index=False)
-summary[["disease_name","model_used","recent_actual_mean","forecast_next_mean",
-         "pct_change_vs_recent","is_rising"]].to_csv(
-    os.path.join(OUT_DIR, "rising_diseases.csv"), index=False)
-forecasts[["date","disease_name","forecast"]].to_csv(
-    os.path.join(OUT_DIR, "forecasts.csv"), index=False)
-
-# Also save versioned snapshots
-stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-clean.to_csv(os.path.join(OUT_DIR, f"clean_timeseries_{stamp}.csv"), index=False)
-summary.to_csv(os.path.join(OUT_DIR, f"rising_diseases_{H}d_{stamp}.csv"), index=False)
-forecasts.to_csv(os.path.join(OUT_DIR, f"forecasts_{H}d_{stamp}.csv"), index=False)
-
-print(f"✅ Model completed ({H} days). Files updated in {OUT_DIR}")
-# small delay so the app can see new mtime on slower disks
-time.sleep(0.5)
+SUMMARY_COLUMNS = ["disease_name","model_used","recent_actual_mean","forecast_next_mean",
+                   "pct_change_vs_recent","is_rising"]
+
+def save_outputs(clean, results, forecast_frames, timings, horizons):
+    # rising_diseases.csv / forecasts.csv: first requested horizon (as before);
+    # *_by_horizon.csv: every horizon, so the app can switch without retraining
+    summaries = {h: pd.DataFrame(results[h]).sort_values("pct_change_vs_recent", ascending=False) for h in horizons}
+    forecasts = {h: pd.concat(forecast_frames[h], ignore_index=True) for h in horizons}
+    first = horizons[0]
+
+    # Always write “latest” files the Streamlit app reads
+    write_output(clean[["date","disease_name","mention_count","sentiment_score","source_reliability"]],
+        os.path.join(OUT_DIR, "clean_timeseries.csv"))
+    write_output(summaries[first][SUMMARY_COLUMNS],
+        os.path.join(OUT_DIR, "rising_diseases.csv"))
+    write_output(forecasts[first][["date","disease_name","forecast"]],
+        os.path.join(OUT_DIR, "forecasts.csv"))
+    write_output(pd.concat([summaries[h][SUMMARY_COLUMNS].assign(horizon_days=h) for h in horizons], ignore_index=True)[
+        ["horizon_days"] + SUMMARY_COLUMNS],
+        os.path.join(OUT_DIR, "rising_diseases_by_horizon.csv"))
+    write_output(pd.concat([forecasts[h].assign(horizon_days=h) for h in horizons], ignore_index=True)[
+        ["horizon_days","date","disease_name","forecast"]],
+        os.path.join(OUT_DIR, "forecasts_by_horizon.csv"))
+    # per-series fit timing
+    pd.DataFrame(timings, columns=["disease_name","model_used","n_obs","fit_mode","fit_seconds",
+                                   "warm_max_abs_diff","warm_sse_vs_cold"]).to_csv(
+        os.path.join(OUT_DIR, "forecast_timings.csv"), index=False)
+
+    # Versioned snapshot: deduplicated store under OUT_DIR/snapshots (see snapshots.py)
+    store = SnapshotStore(OUT_DIR)
+    tables = {"clean_timeseries": clean}
+    for h in horizons:
+        tables[f"rising_diseases_{h}d"] = summaries[h]
+        tables[f"forecasts_{h}d"] = forecasts[h]
+    run_id = store.save_run(tables, meta={"horizons": horizons})
+    removed = store.prune()
+    print(f"📦 Snapshot {run_id} stored" + (f" ({len(removed)} old runs pruned)" if removed else ""))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=parse_horizons, default="7,14,30,60",
+                    help="Forecast horizon(s): 7 or 7,14,30,60 (one fit per disease; "
+                         "the first also goes to rising_diseases.csv / forecasts.csv)")
+    ap.add_argument("--workers", type=int, default=FORECAST_WORKERS,
+                    help="Worker processes for per-disease model fits (1 = serial)")
+    ap.add_argument("--cold-start", action="store_true",
+                    help="Ignore the warm-start cache and fit every model from scratch")
+    ap.add_argument("--check-warm-start", action="store_true",
+                    help="Also refit warm-started models from scratch and report differences > HW_WARM_TOLERANCE")
+    args = ap.parse_args()
+    horizons = args.days
+
+    df, date_col = prepare_articles(pd.read_csv(INPUT))
+    mentions = extract_mentions(df, date_col)
+    if mentions.empty:
+        print("⚠️ No disease mentions found from text/keywords.")
+        write_empty_outputs()
+        raise SystemExit(0)
+
+    clean = build_daily_series(mentions)
+    started = time.perf_counter()
+    results, forecast_frames, timings, hw_cache = forecast_all(
+        clean, horizons, workers=args.workers,
+        hw_cache={} if args.cold_start else load_hw_cache(), check=args.check_warm_start)
+    n_warm = sum(t["fit_mode"] == "warm" for t in timings)
+    print(f"⏱️ Forecasting took {time.perf_counter() - started:.2f}s for {len(timings)} series ({n_warm} warm-started)")
+    save_hw_cache(hw_cache)
+    if args.check_warm_start:
+        checked = [t for t in timings if t["warm_max_abs_diff"] is not None]
+        over = [t for t in checked if t["warm_max_abs_diff"] > HW_WARM_TOLERANCE]
+        for t in over:
+            better = t["warm_sse_vs_cold"] is not None and t["warm_sse_vs_cold"] < 1
+            print(f"⚠️ {t['disease_name']}: warm-start forecast differs by {t['warm_max_abs_diff']:.4f} "
+                  f"(> {HW_WARM_TOLERANCE})" + (" — warm fit has the lower SSE" if better else ""))
+        print(f"🔎 Warm-start check: {len(checked) - len(over)}/{len(checked)} within tolerance")
+    save_outputs(clean, results, forecast_frames, timings, horizons)
+
+    print(f"✅ Model completed ({', '.join(str(h) for h in horizons)} days). Files updated in {OUT_DIR}")
+    # small delay so the app can see new mtime on slower disks
+    time.sleep(0.5)
+
+if __name__ == "__main__":
+    main()
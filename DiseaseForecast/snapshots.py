@@ -0,0 +1,257 @@
+"""
+Deduplicated, retention-managed store for versioned pipeline runs.
+
+Every pipeline_train.py run used to drop three timestamped CSVs per horizon
+into OUT_DIR. Runs now go to OUT_DIR/snapshots instead:
+
+    snapshots/manifest.json              runs -> {table: content hash}
+    snapshots/data/<table>/<hash>.parquet
+
+Tables are content-addressed, so a table that did not change between runs
+(e.g. clean_timeseries when no new articles arrived) is stored once and only
+referenced again. Files are compressed Parquet (gzipped CSV without a Parquet
+engine). Old runs are pruned by SNAPSHOT_KEEP_RUNS / SNAPSHOT_MAX_AGE_DAYS and
+data no run references any more is deleted.
+
+Usage:
+    python snapshots.py list
+    python snapshots.py show <run_id> [table]
+    python snapshots.py compact      # fold legacy *_<stamp>.csv files into the store
+    python snapshots.py prune
+"""
+import os
+import re
+import json
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from outputs_io import HAS_PARQUET
+
+SNAPSHOT_KEEP_RUNS = int(os.environ.get("SNAPSHOT_KEEP_RUNS", "30"))        # 0 = keep all
+SNAPSHOT_MAX_AGE_DAYS = int(os.environ.get("SNAPSHOT_MAX_AGE_DAYS", "0"))   # 0 = no age limit
+
+STAMP_FORMAT = "%Y%m%d_%H%M%S"
+# clean_timeseries_<stamp>.csv, rising_diseases_<H>d_<stamp>.csv, forecasts_<H>d_<stamp>.csv
+LEGACY_RX = re.compile(r"^(clean_timeseries|rising_diseases_\d+d|forecasts_\d+d)_(\d{8}_\d{6})\.csv$")
+
+
+def frame_hash(df: pd.DataFrame) -> str:
+    """content hash of a frame (columns, dtypes and values; index ignored)"""
+    h = hashlib.sha1(json.dumps([[str(c) for c in df.columns], [str(t) for t in df.dtypes]]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()[:16]
+
+
+class SnapshotStore:
+    """runs of named tables under <out_dir>/snapshots, deduplicated by content hash"""
+
+    def __init__(self, out_dir: str):
+        self.root = os.path.join(out_dir, "snapshots")
+        self.out_dir = out_dir
+        self.manifest_path = os.path.join(self.root, "manifest.json")
+        self.ext = ".parquet" if HAS_PARQUET else ".csv.gz"
+
+    # ---- manifest ----
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"runs": []}
+
+    def _save_manifest(self, manifest: dict):
+        os.makedirs(self.root, exist_ok=True)
+        tmp = self.manifest_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp, self.manifest_path)
+
+    # ---- data files ----
+    def _data_path(self, table: str, digest: str, ext: str) -> str:
+        return os.path.join(self.root, "data", table, digest + ext)
+
+    def _write_table(self, table: str, df: pd.DataFrame) -> dict:
+        digest = frame_hash(df)
+        # reuse an existing copy in either format
+        for ext in (".parquet", ".csv.gz"):
+            if os.path.exists(self._data_path(table, digest, ext)):
+                return {"hash": digest, "ext": ext, "rows": len(df)}
+        path = self._data_path(table, digest, self.ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        if self.ext == ".parquet":
+            df.to_parquet(tmp, index=False, compression="gzip")
+        else:
+            df.to_csv(tmp, index=False, compression="gzip")
+        os.replace(tmp, path)
+        return {"hash": digest, "ext": self.ext, "rows": len(df)}
+
+    def _read_table(self, table: str, ref: dict) -> pd.DataFrame:
+        path = self._data_path(table, ref["hash"], ref["ext"])
+        if ref["ext"] == ".parquet":
+            return pd.read_parquet(path)
+        df = pd.read_csv(path, compression="gzip")
+        if "date" in df.columns:
+            df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    # ---- runs ----
+    def save_run(self, tables: dict, run_id: str = None, created_at: datetime = None, meta: dict = None) -> str:
+        """store {table_name: frame} as one run; returns its run_id"""
+        manifest = self._load_manifest()
+        created_at = created_at or datetime.now()
+        run_id = run_id or created_at.strftime(STAMP_FORMAT)
+        taken = {r["run_id"] for r in manifest["runs"]}
+        base, n = run_id, 1
+        while run_id in taken:
+            n += 1
+            run_id = f"{base}-{n}"
+        run = {
+            "run_id": run_id,
+            "created_at": created_at.isoformat(timespec="seconds"),
+            "tables": {name: self._write_table(name, df) for name, df in tables.items()},
+        }
+        if meta:
+            run["meta"] = meta
+        manifest["runs"].append(run)
+        manifest["runs"].sort(key=lambda r: r["created_at"])
+        self._save_manifest(manifest)
+        return run_id
+
+    def runs(self) -> pd.DataFrame:
+        """one row per stored run, oldest first"""
+        rows = [
+            {"run_id": r["run_id"], "created_at": pd.Timestamp(r["created_at"]),
+             "tables": ",".join(sorted(r["tables"]))}
+            for r in self._load_manifest()["runs"]
+        ]
+        return pd.DataFrame(rows, columns=["run_id", "created_at", "tables"])
+
+    def _run(self, run_id: str) -> dict:
+        runs = self._load_manifest()["runs"]
+        if run_id == "latest" and runs:
+            return runs[-1]
+        for r in runs:
+            if r["run_id"] == run_id:
+                return r
+        raise KeyError(f"No snapshot run '{run_id}'")
+
+    def load(self, run_id: str, table: str) -> pd.DataFrame:
+        """one table of one run ("latest" for the newest run)"""
+        run = self._run(run_id)
+        if table not in run["tables"]:
+            raise KeyError(f"Run {run['run_id']} has no table '{table}' (has: {sorted(run['tables'])})")
+        return self._read_table(table, run["tables"][table])
+
+    def history(self, table: str, run_ids=None) -> pd.DataFrame:
+        """a table across runs, stacked with a run_id column"""
+        frames = [
+            self._read_table(table, r["tables"][table]).assign(run_id=r["run_id"])
+            for r in self._load_manifest()["runs"]
+            if table in r["tables"] and (run_ids is None or r["run_id"] in run_ids)
+        ]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    # ---- retention ----
+    def prune(self, keep_runs: int = SNAPSHOT_KEEP_RUNS, max_age_days: int = SNAPSHOT_MAX_AGE_DAYS) -> list:
+        """drop runs beyond the retention policy (the newest run is always kept); returns removed run_ids"""
+        manifest = self._load_manifest()
+        runs = manifest["runs"]
+        keep = runs[-keep_runs:] if keep_runs > 0 else list(runs)
+        if max_age_days > 0:
+            cutoff = datetime.now() - timedelta(days=max_age_days)
+            keep = [r for r in keep if datetime.fromisoformat(r["created_at"]) >= cutoff]
+        if runs and not keep:
+            keep = runs[-1:]
+        removed = [r["run_id"] for r in runs if r not in keep]
+        if removed:
+            manifest["runs"] = keep
+            self._save_manifest(manifest)
+        self._collect_garbage(manifest)
+        return removed
+
+    def _collect_garbage(self, manifest: dict):
+        """delete data files no remaining run references"""
+        live = {
+            self._data_path(name, ref["hash"], ref["ext"])
+            for r in manifest["runs"] for name, ref in r["tables"].items()
+        }
+        data_dir = os.path.join(self.root, "data")
+        for dirpath, _, files in os.walk(data_dir):
+            for fn in files:
+                path = os.path.join(dirpath, fn)
+                if path not in live:
+                    os.remove(path)
+
+    def disk_usage(self) -> int:
+        total = 0
+        for dirpath, _, files in os.walk(self.root):
+            total += sum(os.path.getsize(os.path.join(dirpath, fn)) for fn in files)
+        return total
+
+    # ---- legacy files ----
+    def compact_legacy(self, delete: bool = True) -> int:
+        """fold timestamped *_<stamp>.csv files from out_dir into the store; returns runs imported"""
+        by_stamp = {}
+        for fn in os.listdir(self.out_dir):
+            m = LEGACY_RX.match(fn)
+            if m:
+                by_stamp.setdefault(m.group(2), {})[m.group(1)] = os.path.join(self.out_dir, fn)
+        known = {r["run_id"] for r in self._load_manifest()["runs"]}
+        imported = 0
+        for stamp in sorted(by_stamp):
+            files = by_stamp[stamp]
+            if stamp not in known:
+                tables = {}
+                for name, path in files.items():
+                    df = pd.read_csv(path)
+                    if "date" in df.columns:
+                        df["date"] = pd.to_datetime(df["date"])
+                    tables[name] = df
+                self.save_run(tables, run_id=stamp, created_at=datetime.strptime(stamp, STAMP_FORMAT),
+                              meta={"source": "legacy_csv"})
+                imported += 1
+            if delete:
+                for path in files.values():
+                    os.remove(path)
+        return imported
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect and maintain pipeline run snapshots")
+    ap.add_argument("--out-dir", default=os.environ.get("OUT_DIR", "./outputs"))
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="List stored runs")
+    show = sub.add_parser("show", help="Print a table of a run")
+    show.add_argument("run_id", help="Run id or 'latest'")
+    show.add_argument("table", nargs="?", help="Table name (default: list the run's tables)")
+    compact = sub.add_parser("compact", help="Import legacy timestamped CSVs into the store")
+    compact.add_argument("--keep-files", action="store_true", help="Don't delete the imported CSVs")
+    sub.add_parser("prune", help="Apply SNAPSHOT_KEEP_RUNS / SNAPSHOT_MAX_AGE_DAYS")
+    args = ap.parse_args()
+
+    store = SnapshotStore(args.out_dir)
+    if args.cmd == "list":
+        runs = store.runs()
+        print(runs.to_string(index=False) if not runs.empty else "No snapshot runs stored.")
+        print(f"💾 {store.disk_usage() / 1024:.1f} KiB in {store.root}")
+    elif args.cmd == "show":
+        if args.table:
+            print(store.load(args.run_id, args.table).to_string(index=False))
+        else:
+            run = store._run(args.run_id)
+            for name, ref in sorted(run["tables"].items()):
+                print(f"{name}: {ref['rows']} rows ({ref['hash']})")
+    elif args.cmd == "compact":
+        n = store.compact_legacy(delete=not args.keep_files)
+        print(f"📦 Imported {n} legacy runs | {store.disk_usage() / 1024:.1f} KiB in {store.root}")
+    elif args.cmd == "prune":
+        removed = store.prune()
+        print(f"🧹 Removed {len(removed)} runs | {store.disk_usage() / 1024:.1f} KiB in {store.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ import matplotlib.pyplot as plt
 import streamlit as st
 from datetime import timedelta
 
+from outputs_io import output_exists, output_mtime, read_output_cached
+
 # ------------------- PAGE CONFIG -------------------
 st.set_page_config(page_title="Disease Mention Forecast Dashboard", layout="wide")
 
@@ -18,13 +20,17 @@ OUT_DIR = os.environ.get(
 CLEAN_PATH = os.path.join(OUT_DIR, "clean_timeseries.csv")
 SUMMARY_PATH = os.path.join(OUT_DIR, "rising_diseases.csv")
 FORECAST_PATH = os.path.join(OUT_DIR, "forecasts.csv")
+# All horizons from one training run (pipeline_train.py --days 7,14,30,60)
+SUMMARY_BY_H_PATH = os.path.join(OUT_DIR, "rising_diseases_by_horizon.csv")
+FORECAST_BY_H_PATH = os.path.join(OUT_DIR, "forecasts_by_horizon.csv")
+HORIZONS = [7, 14, 30, 60]
 
 # ------------------- SIDEBAR -------------------
 st.sidebar.header("⚙️ Forecast Settings")
 
 forecast_days = st.sidebar.selectbox(
     "Forecast horizon (days):",
-    [7, 14, 30, 60],
+    HORIZONS,
     index=0
 )
 
@@ -38,44 +44,57 @@ recent_window = st.sidebar.selectbox(
 def wait_for_update(path, old_mtime, timeout=15):
     start = time.time()
     while time.time() - start < timeout:
-        if os.path.exists(path) and os.path.getmtime(path) > old_mtime:
+        if output_mtime(path) > old_mtime:
             return True
         time.sleep(0.3)
     return False
 
+def load_for_horizon(by_horizon_path, legacy_path, days, **read_kw):
+    """
+    Rows for `days` from the multi-horizon output; falls back to the
+    single-horizon file. Returns (df, found_horizon).
+    """
+    if output_exists(by_horizon_path):
+        df = read_output_cached(by_horizon_path, **read_kw)
+        if "horizon_days" in df.columns and (df["horizon_days"] == days).any():
+            df = df[df["horizon_days"] == days].drop(columns="horizon_days")
+            return df.reset_index(drop=True), True
+    if output_exists(legacy_path):
+        return read_output_cached(legacy_path, **read_kw), False
+    return pd.DataFrame(), False
+
 # ------------------- RUN MODEL -------------------
 if st.sidebar.button("🔁 Update Forecast"):
-    st.info(f"Running pipeline for next {forecast_days} days...")
-    old_times = {
-        p: os.path.getmtime(p) if os.path.exists(p) else 0
-        for p in [CLEAN_PATH, SUMMARY_PATH, FORECAST_PATH]
-    }
+    # One run fits each model once and forecasts every horizon; the selected
+    # horizon goes first so it also lands in the single-horizon files
+    horizons = [forecast_days] + [d for d in HORIZONS if d != forecast_days]
+    st.info(f"Running pipeline for {'/'.join(str(d) for d in horizons)}-day horizons...")
+    old_times = {p: output_mtime(p) for p in [CLEAN_PATH, SUMMARY_PATH, FORECAST_PATH]}
     try:
-        subprocess.run(["python", "pipeline_train.py", "--days", str(forecast_days)], check=True)
+        subprocess.run(["python", "pipeline_train.py", "--days", ",".join(str(d) for d in horizons)], check=True)
         ok = any(wait_for_update(p, old_times[p]) for p in old_times)
         if ok:
-            st.success(f"✅ Forecast updated for {forecast_days} days.")
+            st.success(f"✅ Forecasts updated for {', '.join(str(d) for d in horizons)} days.")
             st.balloons()
         else:
             st.warning("Files didn't update. Try re-running or check console.")
     except Exception as e:
         st.error(f"Error running pipeline: {e}")
-    st.cache_data.clear()
     st.rerun()
 
 # ------------------- LOAD DATA -------------------
-if not os.path.exists(CLEAN_PATH) or not os.path.exists(SUMMARY_PATH):
+if not output_exists(CLEAN_PATH) or not output_exists(SUMMARY_PATH):
     st.warning("⚠️ Run the training script first to generate outputs.")
     st.stop()
 
-st.cache_data.clear()
-clean = pd.read_csv(CLEAN_PATH, parse_dates=["date"])
-summary = pd.read_csv(SUMMARY_PATH)
-forecasts = (
-    pd.read_csv(FORECAST_PATH, parse_dates=["date"])
-    if os.path.exists(FORECAST_PATH)
-    else pd.DataFrame()
-)
+# Cached per file version: widget reruns reuse the parsed frames until the
+# pipeline rewrites an output
+clean = read_output_cached(CLEAN_PATH, parse_dates=["date"])
+# Switching horizons is a lookup into the multi-horizon outputs, not a retrain
+summary, has_horizon = load_for_horizon(SUMMARY_BY_H_PATH, SUMMARY_PATH, forecast_days)
+forecasts, _ = load_for_horizon(FORECAST_BY_H_PATH, FORECAST_PATH, forecast_days, parse_dates=["date"])
+if not has_horizon:
+    st.sidebar.caption(f"No stored {forecast_days}-day forecast yet — showing the latest run. Click Update Forecast.")
 
 # ------------------- MAIN LAYOUT -------------------
 st.title("🦠 Disease Mention Trends & Forecasts")
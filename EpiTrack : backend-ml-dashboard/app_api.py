@@ -8,6 +8,8 @@ import streamlit as st
 from streamlit_autorefresh import st_autorefresh
 import pydeck as pdk
 
+from outputs_io import output_exists, output_mtime, read_output_cached
+
 # -------------------------------------------------
 # PAGE CONFIG
 # -------------------------------------------------
@@ -17,95 +19,94 @@ OUT_DIR = os.environ.get("OUT_DIR", "./outputs")
 CLEAN_PATH = os.path.join(OUT_DIR, "clean_timeseries.csv")
 SUMMARY_PATH = os.path.join(OUT_DIR, "rising_diseases.csv")
 FORECASTS_PATH = os.path.join(OUT_DIR, "forecasts.csv")
+# All horizons from one training run (pipeline_train.py --days 7,14,30,60)
+SUMMARY_BY_H_PATH = os.path.join(OUT_DIR, "rising_diseases_by_horizon.csv")
+FORECASTS_BY_H_PATH = os.path.join(OUT_DIR, "forecasts_by_horizon.csv")
+HORIZONS = [7, 14, 30, 60]
 GEO_POINTS_PATH = os.path.join(OUT_DIR, "geo_points.csv")
+# Per country x disease 7-day change, precomputed by pipeline_geo.py
+HOTZONES_PATH = os.path.join(OUT_DIR, "country_hotzones.csv")
+# Heatmap points pre-aggregated by pipeline_geo.py; MAP_GRID_DEG picks a
+# coarser grid level (one of HEATMAP_GRID_DEGREES) for the world view
+HEATMAP_PATH = os.path.join(OUT_DIR, "geo_heatmap.csv")
+MAP_GRID_DEG = float(os.environ.get("MAP_GRID_DEG", "0"))
 
 
 # -------------------------------------------------
 # NEW: FUNCTION TO CHECK GEO FILE TIMESTAMP
 # -------------------------------------------------
 def geo_last_modified() -> float:
-    """Return last modified timestamp of geo_points.csv or 0 if missing."""
-    if not os.path.exists(GEO_POINTS_PATH):
-        return 0.0
-    return os.path.getmtime(GEO_POINTS_PATH)
+    """Return last modified timestamp of geo_points (CSV or Parquet) or 0 if missing."""
+    return float(output_mtime(GEO_POINTS_PATH))
 
 
 # -------------------------------------------------
-# LOAD DATA HELPERS (NO CACHE)
+# LOAD DATA HELPERS (CACHED PER FILE MTIME + SIZE)
 # -------------------------------------------------
-def load_base_data():
-    clean = pd.read_csv(CLEAN_PATH, parse_dates=["date"])
-    summary = pd.read_csv(SUMMARY_PATH)
-    forecasts = pd.read_csv(FORECASTS_PATH, parse_dates=["date"])
-    return clean, summary, forecasts
+def load_for_horizon(by_horizon_path, legacy_path, days, **read_kw):
+    """
+    Rows for `days` from the multi-horizon output, falling back to the
+    single-horizon file. Returns (df, found_horizon).
+    """
+    if output_exists(by_horizon_path):
+        df = read_output_cached(by_horizon_path, **read_kw)
+        if "horizon_days" in df.columns and (df["horizon_days"] == days).any():
+            df = df[df["horizon_days"] == days].drop(columns="horizon_days")
+            return df.reset_index(drop=True), True
+    return read_output_cached(legacy_path, **read_kw), False
+
+
+def load_base_data(days: int):
+    """Time series plus the summary/forecasts for the selected horizon (a lookup, not a retrain)."""
+    clean = read_output_cached(CLEAN_PATH, parse_dates=["date"])
+    summary, has_horizon = load_for_horizon(SUMMARY_BY_H_PATH, SUMMARY_PATH, days)
+    forecasts, _ = load_for_horizon(FORECASTS_BY_H_PATH, FORECASTS_PATH, days, parse_dates=["date"])
+    return clean, summary, forecasts, has_horizon
 
 
 def load_geo_points():
-    if not os.path.exists(GEO_POINTS_PATH):
+    if not output_exists(GEO_POINTS_PATH):
         return None
-    geo = pd.read_csv(GEO_POINTS_PATH, parse_dates=["date"])
+    geo = read_output_cached(GEO_POINTS_PATH, parse_dates=["date"])
     return geo
 
 
-def compute_country_hotzones(geo: pd.DataFrame, country: str) -> pd.DataFrame:
+def load_heatmap_points(country: str) -> pd.DataFrame:
     """
-    For a given country, compute a simple 'hotzone' signal:
-    last 7 days vs previous 7 days per disease.
+    Map points summed per location and disease over all day buckets of
+    geo_heatmap. Falls back to geo_points rows when the pipeline has not
+    written the heatmap table yet. Returns None when neither exists.
     """
-    if geo is None:
-        return pd.DataFrame()
-
-    dfc = geo.copy()
-    dfc = dfc[dfc["country"] == country]
-    if dfc.empty:
-        return pd.DataFrame()
-
-    ts = (
-        dfc.groupby(["date", "disease_name"], as_index=False)["mention_count"]
-        .sum()
-        .sort_values("date")
-    )
-
-    if ts["date"].nunique() < 10:
-        return pd.DataFrame()
-
-    max_date = ts["date"].max()
-    last7_start = max_date - pd.Timedelta(days=6)
-    prev7_end = last7_start - pd.Timedelta(days=1)
-    prev7_start = prev7_end - pd.Timedelta(days=6)
-
-    results = []
-    for dis, g in ts.groupby("disease_name"):
-        g = g.sort_values("date")
-
-        last7 = g[(g["date"] >= last7_start) & (g["date"] <= max_date)]
-        prev7 = g[(g["date"] >= prev7_start) & (g["date"] <= prev7_end)]
-
-        if last7.empty or prev7.empty:
-            continue
-
-        last_mean = last7["mention_count"].mean()
-        prev_mean = prev7["mention_count"].mean()
+    if not output_exists(HEATMAP_PATH):
+        geo = load_geo_points()
+        if geo is None or "lat" not in geo.columns:
+            return None
+        points = geo.dropna(subset=["lat", "lon"])
+        return points if country == "All Countries" else points[points["country"] == country]
+
+    tiles = read_output_cached(HEATMAP_PATH, parse_dates=["date"])
+    if country == "All Countries":
+        grid = MAP_GRID_DEG if (tiles["grid_deg"] == MAP_GRID_DEG).any() else 0.0
+        points = tiles[tiles["grid_deg"] == grid]
+    else:
+        points = tiles[(tiles["grid_deg"] == 0) & (tiles["country"] == country)]
+    points = points.groupby(
+        ["lat", "lon", "disease_name", "country"], as_index=False, observed=True, dropna=False
+    )["mention_count"].sum()
+    # grid levels have no country; keep the tooltip/JSON payload free of NaN
+    return points.assign(country=points["country"].astype(object).fillna(""))
 
-        if prev_mean > 0:
-            pct = (last_mean - prev_mean) / prev_mean
-        else:
-            pct = 1.0 if last_mean > 0 else 0.0
-
-        results.append(
-            {
-                "disease_name": dis,
-                "prev7_mean": round(prev_mean, 3),
-                "last7_mean": round(last_mean, 3),
-                "pct_change": round(pct, 3),
-                "is_hot": bool(pct > 0.30),
-            }
-        )
 
-    if not results:
+def load_country_hotzones(country: str) -> pd.DataFrame:
+    """
+    Hotzone rows (last 7 days vs previous 7 days per disease) for one country,
+    filtered from the table pipeline_geo.py writes next to geo_points.
+    """
+    if not output_exists(HOTZONES_PATH):
         return pd.DataFrame()
-
-    return pd.DataFrame(results).sort_values("pct_change", ascending=False)
+    hot = read_output_cached(HOTZONES_PATH)
+    hot = hot[hot["country"] == country].drop(columns="country")
+    return hot.sort_values("pct_change", ascending=False, kind="stable").reset_index(drop=True)
 
 
 # -------------------------------------------------
@@ -114,10 +115,10 @@ def compute_country_hotzones(geo: pd.DataFrame, country: str) -> pd.DataFrame:
 st.sidebar.header("⚙️ Forecast & View Settings")
 
 forecast_days = st.sidebar.selectbox(
-    "Forecast horizon (model training):",
-    [7, 14, 30, 60],
+    "Forecast horizon:",
+    HORIZONS,
     index=0,
-    help="After changing this, click 'Run / Update Forecast' to regenerate the model outputs.",
+    help="All horizons come from the same training run; click 'Run / Update Forecast' to retrain on new data.",
 )
 
 # -------------------------
@@ -154,17 +155,20 @@ if geo_points is not None and not geo_points.empty:
 
 if st.sidebar.button("🔁 Run / Update Forecast"):
     start = time.time()
-    with st.spinner(f"Running pipeline_train.py for next {forecast_days} days..."):
+    # One run fits each model once and forecasts every horizon; the selected
+    # horizon goes first so it also lands in the single-horizon files
+    horizons = [forecast_days] + [d for d in HORIZONS if d != forecast_days]
+    with st.spinner(f"Running pipeline_train.py for {'/'.join(str(d) for d in horizons)}-day horizons..."):
         try:
             subprocess.run(
-                ["python3", "pipeline_train.py", "--days", str(forecast_days)],
+                ["python3", "pipeline_train.py", "--days", ",".join(str(d) for d in horizons)],
                 check=True,
             )
             # If you ALSO want geo_points refreshed from the same data each time,
             # you can uncomment this:
             # subprocess.run(["python3", "pipeline_geo.py"], check=True)
             time.sleep(1.0)
-            st.success(f"✅ Model updated for {forecast_days}-day horizon.")
+            st.success(f"✅ Model updated for {', '.join(str(d) for d in horizons)}-day horizons.")
             st.balloons()
         except Exception as e:
             st.error(f"⚠️ Error running pipeline: {e}")
@@ -176,14 +180,14 @@ if st.sidebar.button("🔁 Run / Update Forecast"):
 # SAFETY CHECK
 # -------------------------------------------------
 missing = [
-    p for p in [CLEAN_PATH, SUMMARY_PATH, FORECASTS_PATH] if not os.path.exists(p)
+    p for p in [CLEAN_PATH, SUMMARY_PATH, FORECASTS_PATH] if not output_exists(p)
 ]
 if missing:
     st.warning(
         "⚠️ Output files not found.\n\n"
         "From terminal in your venv:\n"
         "```bash\n"
-        "python3 pipeline_train.py --days 7\n"
+        "python3 pipeline_train.py --days 7,14,30,60\n"
         "python3 pipeline_geo.py\n"
         "```\n"
         "Then refresh this app."
@@ -194,12 +198,16 @@ if missing:
 # -------------------------------------------------
 # LOAD BASE DATA
 # -------------------------------------------------
-clean, summary, forecasts = load_base_data()
+clean, summary, forecasts, has_horizon = load_base_data(forecast_days)
+if not has_horizon:
+    st.sidebar.caption(
+        f"No stored {forecast_days}-day forecast yet — showing the latest run. Click 'Run / Update Forecast'."
+    )
 
 st.title("🦠 Disease Mention Trends & Forecasts (Global + Regional)")
 
-if os.path.exists(SUMMARY_PATH):
-    st.caption(f"🕒 Last model update: {time.ctime(os.path.getmtime(SUMMARY_PATH))}")
+if output_exists(SUMMARY_PATH):
+    st.caption(f"🕒 Last model update: {time.ctime(output_mtime(SUMMARY_PATH))}")
 
 
 # -------------------------------------------------
@@ -331,14 +339,10 @@ with right:
 st.markdown("---")
 st.subheader("🌍 Global Map of Disease Mentions")
 
-if geo_points is None or geo_points.empty or "lat" not in geo_points.columns:
+geo = load_heatmap_points(country_pick)
+if geo is None or (geo.empty and country_pick == "All Countries"):
     st.info("No geo_points data with coordinates yet.")
 else:
-    geo = geo_points.dropna(subset=["lat", "lon"])
-
-    if country_pick != "All Countries":
-        geo = geo[geo["country"] == country_pick]
-
     if geo.empty:
         st.info("No geo-tagged points for this selection.")
     else:
@@ -375,8 +379,10 @@ else:
     if country_pick == "All Countries":
         st.caption("Select a specific country in the sidebar.")
     else:
-        hot = compute_country_hotzones(geo_points, country_pick)
-        if hot.empty:
+        hot = load_country_hotzones(country_pick)
+        if not output_exists(HOTZONES_PATH):
+            st.info("No country_hotzones.csv yet — run pipeline_geo.py to build it.")
+        elif hot.empty:
             st.info("Not enough data for hotzones.")
         else:
             st.dataframe(hot, use_container_width=True)
@@ -6,25 +6,231 @@ import pandas as pd
 
 from sqlalchemy import create_engine
 
+from gazetteer import get_gazetteer
+from outputs_io import write_output
+
 OUT_DIR = os.environ.get("OUT_DIR", "./outputs")
 os.makedirs(OUT_DIR, exist_ok=True)
 
 PG_URI = os.environ.get("PG_URI")
 
-# Very simple country → lat/lon lookup.
-# You can add more as needed.
-COUNTRY_COORDS = {
-    "Japan": (36.2048, 138.2529),
-    "New Zealand": (-40.9006, 174.8860),
-    "United States": (37.0902, -95.7129),
-    "USA": (37.0902, -95.7129),
-    "India": (20.5937, 78.9629),
-    "United Kingdom": (55.3781, -3.4360),
-    "UK": (55.3781, -3.4360),
-    "Australia": (-25.2744, 133.7751),
-    "Canada": (56.1304, -106.3468),
-    # add more if you like
-}
+# Aggregate per (date, disease, country) inside Postgres with jsonb_each over
+# disease_breakdown, so only the totals cross the network instead of every
+# article row with its text. Set GEO_SQL_AGGREGATE=0 to aggregate in pandas.
+GEO_SQL_AGGREGATE = os.environ.get("GEO_SQL_AGGREGATE", "1") == "1"
+
+# Map heatmap tiles: points collapsed per (lat, lon, disease, day bucket).
+# HEATMAP_GRID_DEGREES adds coarser levels snapped to a lat/lon grid,
+# e.g. "1,5" -> 1° and 5° cells next to the exact centroids (level 0).
+HEATMAP_BUCKET_DAYS = int(os.environ.get("HEATMAP_BUCKET_DAYS", "7"))
+HEATMAP_GRID_DEGREES = [
+    float(g) for g in os.environ.get("HEATMAP_GRID_DEGREES", "").split(",") if g.strip()
+]
+
+# Same rules as the pandas path: diseases with a positive count in
+# disease_breakdown, else "Unknown" when disease_mention_count > 0; each
+# (article, disease) pair weighs the article's disease_mention_count (min 1).
+GEO_AGGREGATE_SQL = """
+WITH src AS (
+    SELECT
+        date_trunc('day', published_at) AS date,
+        country,
+        CASE WHEN jsonb_typeof(disease_breakdown) = 'object'
+             THEN disease_breakdown END AS breakdown,
+        disease_mention_count,
+        CASE WHEN disease_mention_count > 0
+             THEN disease_mention_count ELSE 1 END AS weight
+    FROM articles
+    WHERE published_at IS NOT NULL
+)
+SELECT date, d.key AS disease_name, country, SUM(weight)::int AS mention_count
+FROM src
+CROSS JOIN LATERAL jsonb_each(COALESCE(breakdown, '{}'::jsonb)) AS d
+WHERE jsonb_typeof(d.value) = 'number' AND (d.value::text)::numeric > 0
+GROUP BY 1, 2, 3
+UNION ALL
+SELECT date, 'Unknown' AS disease_name, country, SUM(weight)::int AS mention_count
+FROM src
+WHERE breakdown IS NULL AND disease_mention_count > 0
+GROUP BY 1, 3
+ORDER BY date DESC, disease_name, country
+"""
+
+
+def country_table(countries) -> pd.DataFrame:
+    """
+    Canonical name and centroid for each distinct stored country value,
+    resolved once each through the gazetteer's alias index
+    ("USA", "U.S.", "United States" -> United States). The column holds
+    country values, so a bare "Georgia" is taken as the country.
+    """
+    gaz = get_gazetteer()
+    rows = []
+    for value in countries:
+        match = gaz.resolve(value, allow_ambiguous=True)
+        if match:
+            rows.append((value, match.name, match.lat, match.lon))
+    return pd.DataFrame(rows, columns=["country", "country_name", "lat", "lon"])
+
+
+def add_coordinates(geo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Left-join canonical country names and lat/lon onto geo rows. Rows with a
+    blank or unknown country keep their raw value and NaN coordinates; they
+    still work for hotzones.
+    """
+    table = country_table(geo["country"].dropna().unique())
+    geo = geo.merge(table, on="country", how="left")
+    geo["country"] = geo["country_name"].where(geo["country_name"].notna(), geo["country"])
+
+    unknown = geo.loc[geo["lat"].isna(), "country"].dropna().astype(str).str.strip()
+    unknown = unknown[unknown != ""]
+    if not unknown.empty:
+        top = ", ".join(f"{c} ({n})" for c, n in unknown.value_counts().head(5).items())
+        print(f"📍 {len(unknown)} rows have a country not in the gazetteer: {top}")
+    return geo[["date", "disease_name", "country", "lat", "lon", "mention_count"]]
+
+
+def expand_geo_records(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per (article, disease), in article order:
+    - diseases are the disease_breakdown keys with a numeric count > 0;
+    - articles without a breakdown dict become "Unknown" if
+      disease_mention_count > 0;
+    - mention_count is the article's disease_mention_count (at least 1).
+    """
+    df = df.reset_index(drop=True)
+    counts = pd.to_numeric(df["disease_mention_count"], errors="coerce")
+    is_dict = df["disease_breakdown"].map(lambda b: isinstance(b, dict)).astype(bool)
+
+    # breakdown dicts -> (row, disease, value) via explode of their items
+    pairs = df.loc[is_dict, "disease_breakdown"].map(lambda b: list(b.items())).explode().dropna()
+    values = pairs.str[1]
+    values = pd.to_numeric(values.where(values.map(lambda v: isinstance(v, (int, float)))), errors="coerce")
+    known = pd.DataFrame({"disease_name": pairs.str[0], "value": values})
+    known = known[known["value"] > 0].drop(columns="value")
+
+    unknown_rows = df.index[~is_dict & (counts > 0)]
+    unknown = pd.DataFrame({"disease_name": "Unknown"}, index=unknown_rows)
+
+    hits = pd.concat([known, unknown]).sort_index(kind="stable")
+    weight = counts.where(counts > 0, 1).astype(int)
+    geo = pd.DataFrame({
+        "date": df["date"].to_numpy()[hits.index],
+        "disease_name": hits["disease_name"].to_numpy(),
+        "country": df["country"].to_numpy()[hits.index],
+        "mention_count": weight.to_numpy()[hits.index],
+    })
+    return add_coordinates(geo)
+
+
+def compute_hotzones(geo: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per country x disease: mean daily mentions over the last 7 days vs the
+    7 days before (windows end at the country's latest date), pct change and
+    an is_hot flag (> +30%). Countries with fewer than 10 distinct dates and
+    diseases missing from either window are left out.
+    """
+    cols = ["country", "disease_name", "prev7_mean", "last7_mean", "pct_change", "is_hot"]
+    geo = geo.dropna(subset=["country", "date"])
+    if geo.empty:
+        return pd.DataFrame(columns=cols)
+
+    ts = geo.groupby(["country", "date", "disease_name"], as_index=False, observed=True)["mention_count"].sum()
+    span = ts.groupby("country", observed=True)["date"].agg(max_date="max", n_dates="nunique")
+    ts = ts.merge(span[span["n_dates"] >= 10], left_on="country", right_index=True)
+
+    age = (ts["max_date"] - ts["date"]).dt.days
+    ts["window"] = np.select([age <= 6, age <= 13], ["last7", "prev7"], "")
+    means = (
+        ts[ts["window"] != ""]
+        .groupby(["country", "disease_name", "window"], observed=True)["mention_count"].mean()
+        .unstack("window")
+        .reindex(columns=["prev7", "last7"])
+        .dropna()
+    )
+    if means.empty:
+        return pd.DataFrame(columns=cols)
+
+    prev, last = means["prev7"], means["last7"]
+    pct = ((last - prev) / prev).where(prev > 0, (last > 0).astype(float))
+    hot = pd.DataFrame({
+        "prev7_mean": prev.round(3),
+        "last7_mean": last.round(3),
+        "pct_change": pct.round(3),
+        "is_hot": pct > 0.30,
+    }).reset_index()
+    return (
+        hot.sort_values(["country", "pct_change"], ascending=[True, False], kind="stable")
+        [cols].reset_index(drop=True)
+    )
+
+
+def compute_heatmap_tiles(geo: pd.DataFrame, bucket_days: int = HEATMAP_BUCKET_DAYS,
+                          grid_degrees=HEATMAP_GRID_DEGREES) -> pd.DataFrame:
+    """
+    Heatmap points summed per (grid level, day bucket, disease, country, lat, lon).
+    Level 0 keeps the exact coordinates; each grid size in `grid_degrees` adds a
+    level with points snapped to the centre of their cell, merged across
+    countries (country is left empty). Buckets start at `date` floored to
+    `bucket_days` days.
+    """
+    cols = ["grid_deg", "date", "disease_name", "country", "lat", "lon", "mention_count"]
+    geo = geo.dropna(subset=["lat", "lon", "date"])
+    if geo.empty:
+        return pd.DataFrame(columns=cols)
+
+    points = geo[["date", "disease_name", "country", "lat", "lon", "mention_count"]].assign(
+        date=geo["date"].dt.floor(f"{max(bucket_days, 1)}D")
+    )
+    levels = []
+    for grid in [0.0] + [g for g in grid_degrees if g > 0]:
+        level = points.assign(grid_deg=grid)
+        if grid:
+            level["lat"] = (np.floor(level["lat"] / grid) + 0.5) * grid
+            level["lon"] = (np.floor(level["lon"] / grid) + 0.5) * grid
+            level["country"] = None
+        levels.append(level)
+
+    return (
+        pd.concat(levels, ignore_index=True)
+        .groupby(cols[:-1], as_index=False, observed=True, dropna=False)["mention_count"].sum()
+        .sort_values(["grid_deg", "date", "disease_name", "country"], ascending=[True, False, True, True])
+        [cols].reset_index(drop=True)
+    )
+
+
+def write_geo_outputs(geo: pd.DataFrame, label: str = "rows"):
+    """geo_points plus the per-country hotzone table derived from it"""
+    path = write_output(geo, os.path.join(OUT_DIR, "geo_points.csv"))
+    print(f"✅ {os.path.basename(path)} written with {len(geo)} {label} to {OUT_DIR}")
+
+    hot = compute_hotzones(geo)
+    path = write_output(hot, os.path.join(OUT_DIR, "country_hotzones.csv"))
+    print(f"🔥 {os.path.basename(path)} written: {int(hot['is_hot'].sum())} hot of {len(hot)} country × disease pairs")
+
+    tiles = compute_heatmap_tiles(geo)
+    path = write_output(tiles, os.path.join(OUT_DIR, "geo_heatmap.csv"))
+    print(f"🗺️ {os.path.basename(path)} written with {len(tiles)} heatmap points ({len(geo)} geo rows)")
+
+
+def main_sql(engine):
+    """geo_points.csv from per-(date, disease, country) totals computed in Postgres"""
+    geo = pd.read_sql(GEO_AGGREGATE_SQL, engine, parse_dates=["date"])
+    if geo.empty:
+        print("⚠️ No geo disease records derived; writing empty geo_points.csv.")
+        write_empty()
+        return
+
+    # aliases of one country ("USA", "United States") collapse into one row
+    geo = (
+        add_coordinates(geo)
+        .groupby(["date", "disease_name", "country", "lat", "lon"], dropna=False, as_index=False)
+        ["mention_count"].sum()
+        .sort_values(["date", "disease_name", "country"], ascending=[False, True, True])
+    )
+    write_geo_outputs(geo, "aggregated rows")
+
 
 def main():
     if not PG_URI:
@@ -33,14 +239,14 @@ def main():
         return
 
     engine = create_engine(PG_URI)
+    if GEO_SQL_AGGREGATE:
+        main_sql(engine)
+        return
+
     df = pd.read_sql(
         """
         SELECT
             id,
-            title,
-            description,
-            source,
-            keywords,
             published_at,
             country,
             disease_mention_count,
@@ -61,65 +267,21 @@ def main():
     df = df.dropna(subset=["published_at"])
     df["date"] = df["published_at"].dt.normalize()
 
-    # parse disease names from disease_breakdown if present,
-    # else fallback to disease_mention_count>0 and title/description.
-    def extract_diseases(row):
-        breakdown = row.get("disease_breakdown", None)
-        if isinstance(breakdown, dict):
-            return [k for k, v in breakdown.items() if (isinstance(v, (int, float)) and v > 0)]
-        # fallback: you could reuse regex, but for simplicity:
-        # if disease_mention_count > 0, just label as "Unknown"
-        if isinstance(row.get("disease_mention_count", 0), (int, float)) and row["disease_mention_count"] > 0:
-            return ["Unknown"]
-        return []
-
-    records = []
-    for _, r in df.iterrows():
-        date = r["date"]
-        country = r.get("country", None)
-        if country is None or str(country).strip() == "":
-            # keep row but without coordinates; will still work for hotzones
-            lat, lon = (None, None)
-        else:
-            c_norm = str(country).strip()
-            lat, lon = COUNTRY_COORDS.get(c_norm, (None, None))
-
-        diseases = extract_diseases(r)
-        if not diseases:
-            continue
-
-        for dis in diseases:
-            mention_count = r.get("disease_mention_count", 1)
-            if not isinstance(mention_count, (int, float)):
-                mention_count = 1
-            if mention_count <= 0:
-                mention_count = 1
-
-            records.append({
-                "date": date.normalize(),
-                "disease_name": dis,
-                "country": country,
-                "lat": lat,
-                "lon": lon,
-                "mention_count": int(mention_count),
-            })
-
-    if not records:
+    geo = expand_geo_records(df)
+    if geo.empty:
         print("⚠️ No geo disease records derived; writing empty geo_points.csv.")
         write_empty()
         return
 
-    geo = pd.DataFrame(records)
-    geo.to_csv(os.path.join(OUT_DIR, "geo_points.csv"), index=False)
-    print(f"✅ geo_points.csv written with {len(geo)} rows to {OUT_DIR}")
+    write_geo_outputs(geo)
 
 
 def write_empty():
     cols = ["date", "disease_name", "country", "lat", "lon", "mention_count"]
-    pd.DataFrame(columns=cols).to_csv(
-        os.path.join(OUT_DIR, "geo_points.csv"), index=False
-    )
-    print("✅ Empty geo_points.csv written.")
+    path = write_output(pd.DataFrame(columns=cols), os.path.join(OUT_DIR, "geo_points.csv"))
+    print(f"✅ Empty {os.path.basename(path)} written.")
+    write_output(compute_hotzones(pd.DataFrame(columns=cols)), os.path.join(OUT_DIR, "country_hotzones.csv"))
+    write_output(compute_heatmap_tiles(pd.DataFrame(columns=cols)), os.path.join(OUT_DIR, "geo_heatmap.csv"))
 
 
 if __name__ == "__main__":
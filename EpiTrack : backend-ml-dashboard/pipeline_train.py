@@ -1,12 +1,18 @@
 import os
 import re
+import json
 import time
+import hashlib
 import argparse
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 import numpy as np
 import pandas as pd
 
+from outputs_io import write_output
+from snapshots import SnapshotStore
+
 # Forecasting lib (optional but recommended)
 try:
     from statsmodels.tsa.holtwinters import ExponentialSmoothing
@@ -16,7 +22,7 @@ except Exception:
 
 # SQLAlchemy for Neon
 try:
-    from sqlalchemy import create_engine
+    from sqlalchemy import create_engine, text
     HAS_SQLA = True
 except Exception:
     HAS_SQLA = False
@@ -32,10 +38,56 @@ os.makedirs(OUT_DIR, exist_ok=True)
 PG_URI = os.environ.get("PG_URI")
 CSV_FALLBACK = os.environ.get("ARTICLES_CSV", "./articles.csv")
 
-def load_articles() -> pd.DataFrame:
+# Per-disease model fits can run in worker processes (1 = serial).
+# A pool is only started when at least FORECAST_PARALLEL_MIN_SERIES series
+# need a Holt–Winters fit; below that, startup costs more than it saves.
+FORECAST_WORKERS = int(os.environ.get("FORECAST_WORKERS", "1"))
+FORECAST_PARALLEL_MIN_SERIES = int(os.environ.get("FORECAST_PARALLEL_MIN_SERIES", "4"))
+
+# Warm-start cache: fitted Holt–Winters parameters per disease are kept in
+# OUT_DIR and used as starting values next run instead of a brute-force grid
+# search. A series is refitted from scratch when its start date or
+# seasonality changed, its history shrank or grew by more than
+# HW_CACHE_MAX_NEW_DAYS, or the warm fit's residual std drifted more than
+# HW_CACHE_MAX_DRIFT (relative) above the cached one. Both are measured
+# against the last cold (brute-force) fit; warm fits only update the
+# starting values, so small nightly changes can't accumulate unchecked.
+HW_CACHE_PATH = os.path.join(OUT_DIR, "hw_param_cache.json")
+HW_CACHE_MAX_NEW_DAYS = int(os.environ.get("HW_CACHE_MAX_NEW_DAYS", "14"))
+HW_CACHE_MAX_DRIFT = float(os.environ.get("HW_CACHE_MAX_DRIFT", "0.2"))
+# --check-warm-start: max allowed |warm - cold| forecast difference (mentions/day)
+HW_WARM_TOLERANCE = float(os.environ.get("HW_WARM_TOLERANCE", "0.1"))
+
+# Persistent daily aggregate store (date × disease × country × source).
+# Each run only extracts mentions from articles whose id is above the
+# store's watermark and adds them in; `--rebuild` (or a change of input or
+# disease patterns) recomputes it from all articles. Article ids come from
+# the single writer in news_fetcher.py, so they are committed in order.
+STORE_PATH = os.path.join(OUT_DIR, "daily_mentions_store.csv")
+STORE_STATE_PATH = os.path.join(OUT_DIR, "daily_mentions_store.json")
+STORE_SCHEMA_VERSION = 1
+STORE_KEYS = ["date", "disease_name", "country", "source"]
+
+# news_fetcher.py's DB_CONFLICT_POLICY=update rewrites re-fetched articles in
+# place, keeping their id, so changes below the watermark would never reach
+# the store. With that policy each run checksums the already-aggregated rows
+# in Postgres and rebuilds the store when the checksum moved.
+DB_CONFLICT_POLICY = os.environ.get("DB_CONFLICT_POLICY", "skip")
+INGESTED_CHECKSUM_SQL = """
+SELECT COUNT(*) AS n,
+       COALESCE(SUM(('x' || LEFT(md5(ROW(
+           title, description, source, keywords, published_at,
+           country, disease_mention_count, disease_breakdown
+       )::text), 15))::bit(60)::bigint), 0) AS digest
+FROM articles
+WHERE id <= :upto_id
+"""
+
+def load_articles(since_id=None) -> pd.DataFrame:
     """
     Load articles either from Neon (PG_URI) or from a local CSV.
     Only uses columns that actually exist in your schema.
+    With `since_id`, only articles with a higher id are returned.
     """
     if PG_URI and HAS_SQLA:
         print("🔌 Using Neon database as input...")
@@ -55,9 +107,16 @@ def load_articles() -> pd.DataFrame:
             confidence_score,
             created_at
         FROM articles
+        {where}
         ORDER BY published_at DESC
         """
-        df = pd.read_sql(query, engine)
+        if since_id is not None:
+            df = pd.read_sql(
+                text(query.format(where="WHERE id > :since_id")), engine,
+                params={"since_id": int(since_id)},
+            )
+        else:
+            df = pd.read_sql(query.format(where=""), engine)
     else:
         print("📄 Using local CSV as input…")
         if not os.path.exists(CSV_FALLBACK):
@@ -65,42 +124,50 @@ def load_articles() -> pd.DataFrame:
                 f"CSV fallback {CSV_FALLBACK} not found and PG_URI not set."
             )
         df = pd.read_csv(CSV_FALLBACK)
+        if since_id is not None and "id" in df.columns:
+            df = df[df["id"] > since_id]
 
     return df
 
 
-df = load_articles()
-
 DATE_CANDIDATES = [
     "published_at", "publishedAt", "published_date",
     "date", "created_at", "fetched_at"
 ]
-date_col = next((c for c in DATE_CANDIDATES if c in df.columns), None)
-if not date_col:
-    raise ValueError(
-        f"No date column found. Looked for {DATE_CANDIDATES}. Got {list(df.columns)}"
-    )
 
-df[date_col] = pd.to_datetime(df[date_col], errors="coerce", utc=True)
-df[date_col] = df[date_col].dt.tz_convert(None)
-df = df.dropna(subset=[date_col])
 
-# Ensure text fields exist
-for col in ["title", "description", "source"]:
-    if col not in df.columns:
-        df[col] = ""
-
-# keywords column may be jsonb/list/str/null
-if "keywords" not in df.columns:
-    df["keywords"] = None
-
-# Build text for regex detection (title + description only)
-df["full_text"] = (
-    df["title"].astype(str) + " " +
-    df["description"].astype(str)
-)
+def prepare_articles(df: pd.DataFrame):
+    """
+    Pick the date column, drop undated rows and build the text used for
+    regex detection. Returns (df, date_col).
+    """
+    date_col = next((c for c in DATE_CANDIDATES if c in df.columns), None)
+    if not date_col:
+        raise ValueError(
+            f"No date column found. Looked for {DATE_CANDIDATES}. Got {list(df.columns)}"
+        )
+
+    df[date_col] = pd.to_datetime(df[date_col], errors="coerce", utc=True)
+    df[date_col] = df[date_col].dt.tz_convert(None)
+    df = df.dropna(subset=[date_col])
+
+    # Ensure text fields exist
+    for col in ["title", "description", "source"]:
+        if col not in df.columns:
+            df[col] = ""
+
+    # keywords column may be jsonb/list/str/null
+    if "keywords" not in df.columns:
+        df["keywords"] = None
+
+    # Build text for regex detection (title + description only)
+    df["full_text"] = (
+        df["title"].astype(str) + " " +
+        df["description"].astype(str)
+    )
 
-print(f"✅ Using date column: {date_col} | rows: {len(df)}")
+    print(f"✅ Using date column: {date_col} | rows: {len(df)}")
+    return df, date_col
 
 
 # =====================================================
@@ -118,101 +185,335 @@ PATTERNS = {
     r"\btuberculosis\b|\btb\b": "Tuberculosis",
     r"\bmeningitis\b": "Meningitis",
 }
-COMPILED = [(re.compile(p, re.I), name) for p, name in PATTERNS.items()]
+# All patterns combined into one alternation with a named group per disease,
+# so each text is scanned once and match.lastgroup tells which disease hit
+DISEASE_RX = re.compile(
+    "|".join(f"(?P<d{i}>{p})" for i, p in enumerate(PATTERNS)), re.I
+)
+GROUP_TO_DISEASE = {f"d{i}": name for i, name in enumerate(PATTERNS.values())}
+DISEASE_ORDER = list(PATTERNS.values())
 KEYWORD_MAP = {name.lower(): name for name in set(PATTERNS.values())}
 
+# Opt-in (PG_AGGREGATE=1, Postgres input only): build the mention store from
+# per-(day, disease, country, source) totals computed in SQL with jsonb_each
+# over news_fetcher's disease_breakdown, instead of pulling every title and
+# description into pandas. Counts then follow news_fetcher's matcher (full
+# article text, longest match wins) rather than the regexes above, so the
+# numbers differ from the default path; switching rebuilds the store.
+PG_AGGREGATE = os.environ.get("PG_AGGREGATE", "0") == "1"
+
+# news_fetcher breakdown terms -> canonical disease names (other terms are ignored)
+BREAKDOWN_TERM_MAP = {
+    "covid": "COVID-19",
+    "coronavirus": "COVID-19",
+    "dengue": "Dengue",
+    "malaria": "Malaria",
+    "flu": "Influenza",
+    "influenza": "Influenza",
+    "avian flu": "Influenza",
+    "swine flu": "Influenza",
+    "measles": "Measles",
+    "ebola": "Ebola",
+    "zika": "Zika",
+    "tuberculosis": "Tuberculosis",
+    "meningitis": "Meningitis",
+}
+
+BREAKDOWN_AGGREGATE_SQL = """
+SELECT
+    date_trunc('day', published_at) AS date,
+    d.key AS term,
+    COALESCE(country, '') AS country,
+    COALESCE(source, '') AS source,
+    SUM((d.value::text)::numeric)::int AS mention_count
+FROM articles
+CROSS JOIN LATERAL jsonb_each(
+    CASE WHEN jsonb_typeof(disease_breakdown) = 'object'
+         THEN disease_breakdown ELSE '{}'::jsonb END
+) AS d
+WHERE published_at IS NOT NULL
+  AND id > :since_id AND id <= :upto_id
+  AND jsonb_typeof(d.value) = 'number'
+  AND d.key = ANY(:terms)
+GROUP BY 1, 2, 3, 4
+"""
+
 
 # =====================================================
 # EXTRACT MENTIONS
 # =====================================================
 
-rows = []
-
-for i, r in df.iterrows():
-    text = str(r["full_text"])
-    date_val = pd.to_datetime(r[date_col]).normalize()
-
-    hit = False
-
-    # 1) Regex-based disease detection in text
-    for rgx, name in COMPILED:
-        matches = rgx.findall(text)
-        if matches:
-            rows.append({
-                "article_id": int(r.get("id", i)),
-                "date": date_val,
-                "disease_name": name,
-                "mention_count": len(matches),
-                "source": r["source"],
-            })
-            hit = True
-
-    # 2) Fallback via keywords (jsonb/list/str)
-    kw = r.get("keywords", None)
-
-    # Normalize keywords into a flat list of lowercase tokens
-    toks = []
-    if not hit and kw is not None:
-        # list from jsonb
-        if isinstance(kw, list):
-            toks = [str(x).lower().strip() for x in kw if x]
-        # dict (rare) -> keys
-        elif isinstance(kw, dict):
-            toks = [str(k).lower().strip() for k in kw.keys()]
-        # string -> split by punctuation/whitespace
-        elif isinstance(kw, str):
-            toks = re.split(r"[,\|;/\s]+", kw.lower())
-        # else: ignore
-
-    if not hit and toks:
-        seen = {}
-        for t in toks:
-            mapped = KEYWORD_MAP.get(t)
-            if mapped:
-                seen[mapped] = seen.get(mapped, 0) + 1
-
-        for name, cnt in seen.items():
-            rows.append({
-                "article_id": int(r.get("id", i)),
-                "date": date_val,
-                "disease_name": name,
-                "mention_count": int(cnt),
-                "source": r["source"],
-            })
-
-mentions = pd.DataFrame(rows)
-
-if mentions.empty:
-    print("⚠️ No disease mentions found from text/keywords.")
-    # Write empty but well-formed files so Streamlit doesn't crash
-    pd.DataFrame(
+def normalize_keywords(kw) -> list:
+    """
+    Flatten a keywords value (jsonb list / dict / delimited string / null)
+    into a list of lowercase tokens.
+    """
+    # list from jsonb
+    if isinstance(kw, list):
+        return [str(x).lower().strip() for x in kw if x]
+    # dict (rare) -> keys
+    if isinstance(kw, dict):
+        return [str(k).lower().strip() for k in kw.keys()]
+    # string -> split by punctuation/whitespace
+    if isinstance(kw, str):
+        return re.split(r"[,\|;/\s]+", kw.lower())
+    # else: ignore
+    return []
+
+
+def extract_mentions(df: pd.DataFrame, date_col: str) -> pd.DataFrame:
+    """
+    One row per (article, disease) with its mention count, computed
+    column-wise: regex matches via str.extractall, keyword fallback via
+    explode for articles without any regex hit.
+    Rows are ordered by article, then disease order (regex) or first
+    keyword appearance (fallback).
+    """
+    columns = ["article_id", "date", "disease_name", "mention_count", "source"]
+    if df.empty:
+        return pd.DataFrame(columns=columns + ["country"])
+    pos = pd.Series(np.arange(len(df)), index=df.index)
+
+    # 1) Regex-based disease detection in text (single pass per text)
+    matches = df["full_text"].astype(str).str.extractall(DISEASE_RX)
+    if len(matches):
+        # Exactly one named group is set per match: that's the disease
+        hit_group = matches.notna().to_numpy().argmax(axis=1)
+        hits = pd.DataFrame({
+            "row": matches.index.get_level_values(0),
+            "disease_name": matches.columns[hit_group].map(GROUP_TO_DISEASE),
+        })
+        regex_counts = (
+            hits.groupby(["row", "disease_name"], sort=False)
+            .size().rename("mention_count").reset_index()
+        )
+        regex_counts["order"] = regex_counts["disease_name"].map(
+            {name: k for k, name in enumerate(DISEASE_ORDER)}
+        )
+    else:
+        regex_counts = pd.DataFrame(columns=["row", "disease_name", "mention_count", "order"])
+
+    # 2) Fallback via keywords (jsonb/list/str) for articles without regex hits
+    kw = df.loc[~df.index.isin(regex_counts["row"]), "keywords"]
+    toks = kw.map(normalize_keywords).explode().dropna()
+    mapped = toks.astype(str).map(KEYWORD_MAP).dropna()
+    kw_hits = pd.DataFrame({"row": mapped.index, "disease_name": mapped.to_numpy()})
+    kw_counts = (
+        kw_hits.groupby(["row", "disease_name"], sort=False)
+        .size().rename("mention_count").reset_index()
+    )
+    # first-appearance order within each article
+    kw_counts["order"] = kw_counts.groupby("row").cumcount()
+
+    counts = pd.concat([regex_counts, kw_counts], ignore_index=True)
+    if counts.empty:
+        return pd.DataFrame(columns=columns + ["country"])
+    counts["pos"] = counts["row"].map(pos)
+    counts = counts.sort_values(["pos", "order"], kind="stable")
+
+    rows = df.loc[counts["row"]]
+    ids = rows["id"].astype(int).to_numpy() if "id" in df.columns else counts["row"].astype(int).to_numpy()
+    return pd.DataFrame({
+        "article_id": ids,
+        "date": rows[date_col].dt.normalize().to_numpy(),
+        "disease_name": counts["disease_name"].to_numpy(),
+        "mention_count": counts["mention_count"].astype(int).to_numpy(),
+        "source": rows["source"].to_numpy(),
+        "country": rows["country"].to_numpy() if "country" in df.columns else None,
+    }, columns=columns + ["country"])
+
+
+# =====================================================
+# INCREMENTAL DAILY AGGREGATE STORE
+# =====================================================
+
+def use_pg_aggregate() -> bool:
+    return PG_AGGREGATE and bool(PG_URI) and HAS_SQLA
+
+
+def load_breakdown_aggregates(since_id=None):
+    """
+    Per-(date, disease, country, source) totals for articles above `since_id`,
+    summed in Postgres from disease_breakdown. Returns (frame, max article id).
+    """
+    print("🔌 Aggregating disease_breakdown in Postgres...")
+    engine = create_engine(PG_URI)
+    with engine.connect() as conn:
+        upto_id = conn.execute(text("SELECT MAX(id) FROM articles")).scalar()
+        if upto_id is None or (since_id is not None and upto_id <= since_id):
+            return pd.DataFrame(columns=STORE_KEYS + ["mention_count"]), upto_id
+        agg = pd.read_sql(
+            text(BREAKDOWN_AGGREGATE_SQL), conn,
+            params={
+                "since_id": int(since_id) if since_id is not None else 0,
+                "upto_id": int(upto_id),
+                "terms": list(BREAKDOWN_TERM_MAP),
+            },
+            parse_dates=["date"],
+        )
+    agg["disease_name"] = agg["term"].map(BREAKDOWN_TERM_MAP)
+    return aggregate_mentions(agg[STORE_KEYS + ["mention_count"]]), int(upto_id)
+
+
+def store_fingerprint() -> str:
+    """
+    Identifies the input and extraction rules the store was built with;
+    if either changes, the store is rebuilt.
+    """
+    if PG_URI and HAS_SQLA:
+        source = "postgres:" + hashlib.sha1(PG_URI.encode()).hexdigest()[:12]
+    else:
+        source = "csv:" + os.path.abspath(CSV_FALLBACK)
+    if use_pg_aggregate():
+        rules = json.dumps([STORE_SCHEMA_VERSION, "breakdown", sorted(BREAKDOWN_TERM_MAP.items())])
+    else:
+        rules = json.dumps([STORE_SCHEMA_VERSION, PATTERNS, sorted(KEYWORD_MAP.items())])
+    return source + ":" + hashlib.sha1(rules.encode()).hexdigest()[:12]
+
+
+def aggregate_mentions(mentions: pd.DataFrame) -> pd.DataFrame:
+    """Sum mention rows per store key"""
+    mentions = mentions.copy()
+    for col in ["country", "source"]:
+        mentions[col] = mentions[col].fillna("").astype(str)
+    return (
+        mentions.groupby(STORE_KEYS, as_index=False)["mention_count"].sum()
+        .astype({"mention_count": int})
+    )
+
+
+def ingested_checksum(upto_id):
+    """
+    Order-independent checksum of the articles with id <= `upto_id`, or None
+    unless the input is Postgres with DB_CONFLICT_POLICY=update.
+    """
+    if DB_CONFLICT_POLICY != "update" or not (PG_URI and HAS_SQLA) or upto_id is None:
+        return None
+    engine = create_engine(PG_URI)
+    with engine.connect() as conn:
+        row = conn.execute(text(INGESTED_CHECKSUM_SQL), {"upto_id": int(upto_id)}).one()
+    return f"{row.n}:{row.digest}"
+
+
+def load_store():
+    """Return (store frame or None, state dict)"""
+    try:
+        with open(STORE_STATE_PATH) as f:
+            state = json.load(f)
+        store = pd.read_csv(
+            STORE_PATH, parse_dates=["date"], keep_default_na=False,
+            dtype={"country": str, "source": str},
+        )
+    except (OSError, ValueError):
+        return None, {}
+    return store, state
+
+
+def save_store(store: pd.DataFrame, state: dict):
+    """Write the store and its state; state goes last so a crash leaves the old watermark"""
+    tmp = STORE_PATH + ".tmp"
+    store.to_csv(tmp, index=False)
+    os.replace(tmp, STORE_PATH)
+    tmp = STORE_STATE_PATH + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, STORE_STATE_PATH)
+
+
+def update_mention_store(rebuild: bool = False) -> pd.DataFrame:
+    """
+    Bring the daily aggregate store up to date and return it.
+    Incremental runs load and extract only articles above the watermark;
+    a rebuild reprocesses all articles. Without article ids (CSV input
+    lacking an `id` column) every run is a rebuild, and with
+    DB_CONFLICT_POLICY=update so is every run after stored articles changed. With PG_AGGREGATE the
+    new rows arrive already aggregated from Postgres.
+    """
+    fingerprint = store_fingerprint()
+    store, state = (None, {}) if rebuild else load_store()
+    if store is not None and state.get("fingerprint") != fingerprint:
+        print("♻️ Input or disease patterns changed — rebuilding the mention store.")
+        store, state = None, {}
+    if (store is not None and DB_CONFLICT_POLICY == "update"
+            and ingested_checksum(state.get("watermark_id")) != state.get("checksum")):
+        print("♻️ Already aggregated articles were rewritten (DB_CONFLICT_POLICY=update) — rebuilding the mention store.")
+        store, state = None, {}
+
+    watermark = state.get("watermark_id") if store is not None else None
+    if use_pg_aggregate():
+        new, max_id = load_breakdown_aggregates(since_id=watermark)
+        has_ids = True
+        loaded = f"articles up to id {max_id}"
+    else:
+        raw = load_articles(since_id=watermark)
+        has_ids = "id" in raw.columns
+        max_id = int(raw["id"].max()) if has_ids and len(raw) else None
+        loaded = f"{len(raw)} articles"
+        if raw.empty:
+            new = pd.DataFrame(columns=STORE_KEYS + ["mention_count"])
+        else:
+            df, date_col = prepare_articles(raw)
+            new = aggregate_mentions(extract_mentions(df, date_col))
+    incremental = watermark is not None and has_ids
+
+    if incremental:
+        print(f"➕ New {loaded} since id {watermark} → {len(new)} aggregate rows")
+        if not new.empty:
+            store = (
+                pd.concat([store, new], ignore_index=True)
+                .groupby(STORE_KEYS, as_index=False)["mention_count"].sum()
+            )
+    else:
+        print(f"🧱 Mention store rebuilt from {loaded} → {len(new)} aggregate rows")
+        store = new
+
+    if max_id is not None:
+        watermark = max(max_id, watermark or 0)
+    save_store(store, {
+        "fingerprint": fingerprint,
+        "watermark_id": watermark if has_ids else None,
+        "checksum": ingested_checksum(watermark) if has_ids else None,
+        "rows": len(store),
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+    })
+    return store
+
+
+def write_empty_outputs():
+    """Write empty but well-formed files so Streamlit doesn't crash"""
+    write_output(pd.DataFrame(
         columns=["date", "disease_name", "mention_count",
                  "sentiment_score", "source_reliability"]
-    ).to_csv(os.path.join(OUT_DIR, "clean_timeseries.csv"), index=False)
+    ), os.path.join(OUT_DIR, "clean_timeseries.csv"))
 
-    pd.DataFrame(
+    write_output(pd.DataFrame(
         columns=[
             "disease_name", "model_used", "recent_actual_mean",
             "forecast_next_mean", "forecast_lower_95", "forecast_upper_95",
             "pct_change_vs_recent", "is_rising"
         ]
-    ).to_csv(os.path.join(OUT_DIR, "rising_diseases.csv"), index=False)
+    ), os.path.join(OUT_DIR, "rising_diseases.csv"))
 
-    pd.DataFrame(
+    write_output(pd.DataFrame(
         columns=["date", "disease_name", "forecast",
                  "lower_95", "upper_95"]
-    ).to_csv(os.path.join(OUT_DIR, "forecasts.csv"), index=False)
+    ), os.path.join(OUT_DIR, "forecasts.csv"))
 
-    print("✅ Empty outputs written (no diseases detected).")
-    raise SystemExit(0)
+    write_output(
+        pd.DataFrame(columns=["horizon_days"] + SUMMARY_COLUMNS),
+        os.path.join(OUT_DIR, "rising_diseases_by_horizon.csv"),
+    )
+
+    write_output(
+        pd.DataFrame(columns=["horizon_days"] + FORECAST_COLUMNS),
+        os.path.join(OUT_DIR, "forecasts_by_horizon.csv"),
+    )
 
 
 # =====================================================
 # AGGREGATE TO DAILY TIME SERIES
 # =====================================================
 
-agg = mentions.groupby(["date", "disease_name"], as_index=False)["mention_count"].sum()
-
 def fill_daily(group: pd.DataFrame) -> pd.DataFrame:
     group = group.set_index("date").sort_index()
     idx = pd.date_range(group.index.min(), group.index.max(), freq="D")
@@ -221,32 +522,148 @@ def fill_daily(group: pd.DataFrame) -> pd.DataFrame:
     group["mention_count"] = group["mention_count"].astype(float)
     return group.reset_index()
 
-filled = []
-for dis, g in agg.groupby("disease_name"):
-    d = fill_daily(g)
-    d["disease_name"] = dis
-    filled.append(d)
 
-clean = pd.concat(filled, ignore_index=True)
+def build_daily_series(mentions: pd.DataFrame) -> pd.DataFrame:
+    """Daily mention counts per disease, with missing days filled with 0"""
+    agg = mentions.groupby(["date", "disease_name"], as_index=False)["mention_count"].sum()
 
-# Placeholders (upgrade later if you want)
-clean["sentiment_score"] = 0.0
-clean["source_reliability"] = 0.5
+    filled = []
+    for dis, g in agg.groupby("disease_name"):
+        d = fill_daily(g)
+        d["disease_name"] = dis
+        filled.append(d)
+
+    clean = pd.concat(filled, ignore_index=True)
+
+    # Placeholders (upgrade later if you want)
+    clean["sentiment_score"] = 0.0
+    clean["source_reliability"] = 0.5
+    return clean
 
 
 # =====================================================
 # FORECASTING + CONFIDENCE INTERVALS
 # =====================================================
 
-ap = argparse.ArgumentParser()
-ap.add_argument("--days", type=int, default=7, help="Forecast horizon (7/14/30/60)")
-args = ap.parse_args()
-H = int(args.days)
+def needs_model_fit(g: pd.DataFrame) -> bool:
+    """True if the series is long and non-zero enough for a Holt–Winters fit"""
+    return HAS_SM and len(g) >= 10 and bool((g["mention_count"] > 0).any())
+
 
-results = []
-forecast_frames = []
+def parse_horizons(value: str) -> list:
+    """'7' or '7,14,30,60' -> [7] / [7, 14, 30, 60] (duplicates dropped, order kept)"""
+    horizons = []
+    for part in str(value).split(","):
+        if part.strip():
+            h = int(part)
+            if h <= 0:
+                raise argparse.ArgumentTypeError(f"Forecast horizon must be positive: {h}")
+            if h not in horizons:
+                horizons.append(h)
+    if not horizons:
+        raise argparse.ArgumentTypeError("At least one forecast horizon is required")
+    return horizons
 
-for dis, g in clean.groupby("disease_name"):
+
+def load_hw_cache(path: str = HW_CACHE_PATH) -> dict:
+    """Cached Holt–Winters parameters per disease ({} if missing or unreadable)"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_hw_cache(cache: dict, path: str = HW_CACHE_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(cache, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def residual_std(y: pd.Series, fitted) -> float:
+    resid_std = float(np.nanstd(y - fitted, ddof=1))
+    return resid_std if np.isfinite(resid_std) else 0.0
+
+
+def warm_start_params(entry, g: pd.DataFrame, seasonal):
+    """
+    Starting values from a cache entry, or None when the series must be
+    fitted from scratch (see HW_CACHE_MAX_NEW_DAYS).
+    """
+    if not entry:
+        return None
+    if entry.get("seasonal_periods") != seasonal:
+        return None
+    if entry.get("start_date") != g["date"].min().strftime("%Y-%m-%d"):
+        return None
+    new_days = len(g) - int(entry.get("n_obs", 0))
+    if new_days < 0 or new_days > HW_CACHE_MAX_NEW_DAYS:
+        return None
+    return np.asarray(entry["start_params"], dtype=float)
+
+
+def fit_holt_winters(y: pd.Series, seasonal, start=None, cached_resid_std=None):
+    """
+    Fit Holt–Winters, warm-started from `start` when given. Falls back to
+    the brute-force search if the warm fit fails or its residual std drifts
+    above the cached one. Returns (fit result, residual std, fit mode).
+    """
+    model = ExponentialSmoothing(
+        y,
+        trend="add",
+        seasonal=("add" if seasonal else None),
+        seasonal_periods=seasonal,
+        initialization_method="estimated",
+    )
+    if start is not None:
+        try:
+            hw = model.fit(optimized=True, use_brute=False, start_params=start)
+            resid_std = residual_std(y, hw.fittedvalues)
+            if resid_std <= (cached_resid_std or 0.0) * (1 + HW_CACHE_MAX_DRIFT) + 1e-9:
+                return hw, resid_std, "warm"
+        except Exception:
+            pass
+    hw = model.fit(optimized=True, use_brute=True)
+    return hw, residual_std(y, hw.fittedvalues), "cold"
+
+
+def hw_cache_entry(hw, g: pd.DataFrame, seasonal, resid_std: float, cold_entry=None) -> dict:
+    """
+    Parameters of a fitted model in start_params order, plus what invalidates
+    them. After a warm fit pass the previous entry as `cold_entry`: only
+    start_params move, n_obs / resid_std stay those of the last cold fit.
+    """
+    p = hw.params
+    start = [p["smoothing_level"], p["smoothing_trend"]]
+    if seasonal:
+        start.append(p["smoothing_seasonal"])
+    start += [p["initial_level"], p["initial_trend"]]
+    if seasonal:
+        start += list(np.asarray(p["initial_seasons"], dtype=float))
+    if cold_entry:
+        return dict(cold_entry, start_params=[float(v) for v in start])
+    return {
+        "start_date": g["date"].min().strftime("%Y-%m-%d"),
+        "n_obs": len(g),
+        "seasonal_periods": seasonal,
+        "start_params": [float(v) for v in start],
+        "resid_std": resid_std,
+    }
+
+
+def forecast_series(dis: str, g: pd.DataFrame, horizons: list, cache_entry=None, check=False):
+    """
+    Forecast one disease series with 95% CI for every horizon in `horizons`.
+    The model is fitted once and forecasts max(horizons) days; each horizon
+    is a prefix of that path. `cache_entry` (from the warm-start cache) seeds
+    the fit; with `check`, warm fits are compared against a cold refit.
+    Returns ({H: summary row}, {H: forecast frame}, timing row, new cache
+    entry or None). Runs in a worker process when fitting in parallel, so it
+    only depends on its arguments.
+    """
+    started = time.perf_counter()
+    H = max(horizons)
     g = g.sort_values("date")
     y = g["mention_count"].astype(float)
 
@@ -254,6 +671,10 @@ for dis, g in clean.groupby("disease_name"):
     lower_ci = None
     upper_ci = None
     model_used = None
+    fit_mode = None
+    new_entry = None
+    warm_diff = None
+    warm_sse_ratio = None
 
     # Case 1: all-zero history
     if (y > 0).sum() == 0:
@@ -267,21 +688,23 @@ for dis, g in clean.groupby("disease_name"):
         if HAS_SM and len(y) >= 10:
             try:
                 seasonal = 7 if len(y) >= 21 else None
-                hw = ExponentialSmoothing(
-                    y,
-                    trend="add",
-                    seasonal=("add" if seasonal else None),
-                    seasonal_periods=seasonal,
-                    initialization_method="estimated",
-                ).fit(optimized=True, use_brute=True)
+                hw, resid_std, fit_mode = fit_holt_winters(
+                    y, seasonal,
+                    start=warm_start_params(cache_entry, g, seasonal),
+                    cached_resid_std=(cache_entry or {}).get("resid_std"),
+                )
 
                 fc = hw.forecast(H).values
                 model_used = "Holt-Winters"
+                new_entry = hw_cache_entry(hw, g, seasonal, resid_std,
+                                           cold_entry=cache_entry if fit_mode == "warm" else None)
+
+                if check and fit_mode == "warm":
+                    cold, _, _ = fit_holt_winters(y, seasonal)
+                    warm_diff = float(np.max(np.abs(fc - cold.forecast(H).values)))
+                    # < 1: the warm fit found a better optimum than the grid search
+                    warm_sse_ratio = float(hw.sse / cold.sse) if cold.sse > 0 else None
 
-                resid = y - hw.fittedvalues
-                resid_std = float(np.nanstd(resid, ddof=1))
-                if not np.isfinite(resid_std):
-                    resid_std = 0.0
                 z = 1.96  # 95% CI
                 lower_ci = fc - z * resid_std
                 upper_ci = fc + z * resid_std
@@ -289,6 +712,8 @@ for dis, g in clean.groupby("disease_name"):
                 fc = None
                 lower_ci = None
                 upper_ci = None
+                fit_mode = None
+                new_entry = None
 
         # Case 3: fallback to Moving Average + CI
         if fc is None:
@@ -321,70 +746,219 @@ for dis, g in clean.groupby("disease_name"):
         periods=H,
         freq="D"
     )
-    forecast_frames.append(pd.DataFrame({
-        "date": future_dates,
+    recent_mean = float(y.tail(7).mean()) if len(y) else 0.0
+
+    results = {}
+    frames = {}
+    for h in horizons:
+        frames[h] = pd.DataFrame({
+            "date": future_dates[:h],
+            "disease_name": dis,
+            "forecast": fc[:h],
+            "lower_95": lower_ci[:h],
+            "upper_95": upper_ci[:h],
+        })
+
+        # Summary stats for rising_diseases table
+        next_mean = float(fc[:h].mean())
+        next_lower_mean = float(lower_ci[:h].mean())
+        next_upper_mean = float(upper_ci[:h].mean())
+
+        if recent_mean > 0:
+            pct = (next_mean - recent_mean) / recent_mean
+        else:
+            pct = 1.0 if next_mean > 0 else 0.0
+
+        results[h] = {
+            "disease_name": dis,
+            "model_used": model_used,
+            "recent_actual_mean": round(recent_mean, 3),
+            "forecast_next_mean": round(next_mean, 3),
+            "forecast_lower_95": round(next_lower_mean, 3),
+            "forecast_upper_95": round(next_upper_mean, 3),
+            "pct_change_vs_recent": round(pct, 3),
+            "is_rising": bool(pct > 0.15),
+        }
+    timing = {
         "disease_name": dis,
-        "forecast": fc,
-        "lower_95": lower_ci,
-        "upper_95": upper_ci,
-    }))
+        "model_used": model_used,
+        "n_obs": len(y),
+        "fit_mode": fit_mode,
+        "fit_seconds": round(time.perf_counter() - started, 4),
+        "warm_max_abs_diff": warm_diff,
+        "warm_sse_vs_cold": warm_sse_ratio,
+    }
+    return results, frames, timing, new_entry
 
-    # Summary stats for rising_diseases table
-    recent_mean = float(y.tail(7).mean()) if len(y) else 0.0
-    next_mean = float(fc.mean())
-    next_lower_mean = float(lower_ci.mean())
-    next_upper_mean = float(upper_ci.mean())
 
-    if recent_mean > 0:
-        pct = (next_mean - recent_mean) / recent_mean
+def forecast_all(clean: pd.DataFrame, horizons: list, workers: int = FORECAST_WORKERS,
+                 hw_cache=None, check=False):
+    """
+    Forecast every disease series for all horizons. With workers > 1 and
+    enough series that need a model fit, the fits run in a process pool;
+    results keep the (sorted) disease order either way.
+    Returns ({H: results}, {H: forecast_frames}, timings, new hw_cache).
+    """
+    hw_cache = hw_cache or {}
+    series = [(dis, g) for dis, g in clean.groupby("disease_name")]
+    entries = [hw_cache.get(dis) for dis, _ in series]
+    n_fits = sum(needs_model_fit(g) for _, g in series)
+
+    if workers > 1 and n_fits >= FORECAST_PARALLEL_MIN_SERIES:
+        print(f"⚙️ Fitting {len(series)} series on {workers} worker processes…")
+        with ProcessPoolExecutor(max_workers=min(workers, len(series))) as pool:
+            outputs = list(pool.map(
+                forecast_series,
+                [dis for dis, _ in series],
+                [g for _, g in series],
+                [horizons] * len(series),
+                entries,
+                [check] * len(series),
+            ))
     else:
-        pct = 1.0 if next_mean > 0 else 0.0
+        outputs = [
+            forecast_series(dis, g, horizons, entry, check)
+            for (dis, g), entry in zip(series, entries)
+        ]
 
-    results.append({
-        "disease_name": dis,
-        "model_used": model_used,
-        "recent_actual_mean": round(recent_mean, 3),
-        "forecast_next_mean": round(next_mean, 3),
-        "forecast_lower_95": round(next_lower_mean, 3),
-        "forecast_upper_95": round(next_upper_mean, 3),
-        "pct_change_vs_recent": round(pct, 3),
-        "is_rising": bool(pct > 0.15),
-    })
+    results = {h: [out[0][h] for out in outputs] for h in horizons}
+    forecast_frames = {h: [out[1][h] for out in outputs] for h in horizons}
+    timings = [out[2] for out in outputs]
+    new_cache = {dis: out[3] for (dis, _), out in zip(series, outputs) if out[3]}
+    return results, forecast_frames, timings, new_cache
 
 
 # =====================================================
 # SAVE OUTPUTS
 # =====================================================
 
-summary = pd.DataFrame(results).sort_values(
-    "pct_change_vs_recent", ascending=False
-)
-forecasts = pd.concat(forecast_frames, ignore_index=True)
-
-# Latest versions used by Streamlit
-clean[["date", "disease_name", "mention_count",
-       "sentiment_score", "source_reliability"]].to_csv(
-    os.path.join(OUT_DIR, "clean_timeseries.csv"), index=False
-)
-
-summary[[
+SUMMARY_COLUMNS = [
     "disease_name", "model_used", "recent_actual_mean",
     "forecast_next_mean", "forecast_lower_95", "forecast_upper_95",
     "pct_change_vs_recent", "is_rising"
-]].to_csv(
-    os.path.join(OUT_DIR, "rising_diseases.csv"), index=False
-)
+]
+FORECAST_COLUMNS = ["date", "disease_name", "forecast", "lower_95", "upper_95"]
 
-forecasts[["date", "disease_name", "forecast",
-           "lower_95", "upper_95"]].to_csv(
-    os.path.join(OUT_DIR, "forecasts.csv"), index=False
-)
 
-# Versioned snapshots
-stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-clean.to_csv(os.path.join(OUT_DIR, f"clean_timeseries_{stamp}.csv"), index=False)
-summary.to_csv(os.path.join(OUT_DIR, f"rising_diseases_{H}d_{stamp}.csv"), index=False)
-forecasts.to_csv(os.path.join(OUT_DIR, f"forecasts_{H}d_{stamp}.csv"), index=False)
+def save_outputs(clean, results, forecast_frames, timings, horizons):
+    """
+    Write the latest outputs plus versioned snapshots.
+    rising_diseases.csv / forecasts.csv hold the first requested horizon
+    (as before); the *_by_horizon.csv files hold every horizon, keyed by
+    horizon_days, so the dashboard can switch horizons without retraining.
+    """
+    summaries = {
+        h: pd.DataFrame(results[h]).sort_values("pct_change_vs_recent", ascending=False)
+        for h in horizons
+    }
+    forecasts = {h: pd.concat(forecast_frames[h], ignore_index=True) for h in horizons}
+    first = horizons[0]
+
+    # Latest versions used by Streamlit
+    write_output(
+        clean[["date", "disease_name", "mention_count",
+               "sentiment_score", "source_reliability"]],
+        os.path.join(OUT_DIR, "clean_timeseries.csv"),
+    )
+
+    write_output(
+        summaries[first][SUMMARY_COLUMNS],
+        os.path.join(OUT_DIR, "rising_diseases.csv"),
+    )
+
+    write_output(
+        forecasts[first][FORECAST_COLUMNS],
+        os.path.join(OUT_DIR, "forecasts.csv"),
+    )
+
+    write_output(
+        pd.concat(
+            [summaries[h][SUMMARY_COLUMNS].assign(horizon_days=h) for h in horizons],
+            ignore_index=True,
+        )[["horizon_days"] + SUMMARY_COLUMNS],
+        os.path.join(OUT_DIR, "rising_diseases_by_horizon.csv"),
+    )
+
+    write_output(
+        pd.concat(
+            [forecasts[h][FORECAST_COLUMNS].assign(horizon_days=h) for h in horizons],
+            ignore_index=True,
+        )[["horizon_days"] + FORECAST_COLUMNS],
+        os.path.join(OUT_DIR, "forecasts_by_horizon.csv"),
+    )
+
+    # Per-series fit timing (side file, so the tables above keep their schema)
+    pd.DataFrame(timings, columns=[
+        "disease_name", "model_used", "n_obs", "fit_mode", "fit_seconds",
+        "warm_max_abs_diff", "warm_sse_vs_cold"
+    ]).to_csv(
+        os.path.join(OUT_DIR, "forecast_timings.csv"), index=False
+    )
+
+    # Versioned snapshot: deduplicated, retention-managed store under
+    # OUT_DIR/snapshots (see snapshots.py)
+    store = SnapshotStore(OUT_DIR)
+    tables = {"clean_timeseries": clean}
+    for h in horizons:
+        tables[f"rising_diseases_{h}d"] = summaries[h]
+        tables[f"forecasts_{h}d"] = forecasts[h]
+    run_id = store.save_run(tables, meta={"horizons": horizons})
+    removed = store.prune()
+    print(f"📦 Snapshot {run_id} stored" + (f" ({len(removed)} old runs pruned)" if removed else ""))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=parse_horizons, default="7,14,30,60",
+                    help="Forecast horizon(s) in days, e.g. 7 or 7,14,30,60 (one fit per disease; "
+                         "the first horizon also goes to rising_diseases.csv / forecasts.csv)")
+    ap.add_argument("--workers", type=int, default=FORECAST_WORKERS,
+                    help="Worker processes for per-disease model fits (1 = serial)")
+    ap.add_argument("--cold-start", action="store_true",
+                    help="Ignore the warm-start cache and fit every model from scratch")
+    ap.add_argument("--check-warm-start", action="store_true",
+                    help=f"Also refit warm-started models from scratch and report forecast "
+                         f"differences above HW_WARM_TOLERANCE ({HW_WARM_TOLERANCE})")
+    ap.add_argument("--rebuild", action="store_true",
+                    help="Recompute the daily mention store from all articles (e.g. after schema changes)")
+    args = ap.parse_args()
+    horizons = args.days
+
+    mentions = update_mention_store(rebuild=args.rebuild)
+
+    if mentions.empty:
+        print("⚠️ No disease mentions found from text/keywords.")
+        write_empty_outputs()
+        print("✅ Empty outputs written (no diseases detected).")
+        raise SystemExit(0)
+
+    clean = build_daily_series(mentions)
+
+    started = time.perf_counter()
+    hw_cache = {} if args.cold_start else load_hw_cache()
+    results, forecast_frames, timings, hw_cache = forecast_all(
+        clean, horizons, workers=args.workers, hw_cache=hw_cache, check=args.check_warm_start
+    )
+    n_warm = sum(t["fit_mode"] == "warm" for t in timings)
+    print(f"⏱️ Forecasting took {time.perf_counter() - started:.2f}s for {len(timings)} series "
+          f"({n_warm} warm-started)")
+    save_hw_cache(hw_cache)
+
+    if args.check_warm_start:
+        checked = [t for t in timings if t["warm_max_abs_diff"] is not None]
+        over = [t for t in checked if t["warm_max_abs_diff"] > HW_WARM_TOLERANCE]
+        for t in over:
+            better = t["warm_sse_vs_cold"] is not None and t["warm_sse_vs_cold"] < 1
+            print(f"⚠️ {t['disease_name']}: warm-start forecast differs by "
+                  f"{t['warm_max_abs_diff']:.4f} (> {HW_WARM_TOLERANCE})"
+                  + (" — warm fit has the lower SSE" if better else ""))
+        print(f"🔎 Warm-start check: {len(checked) - len(over)}/{len(checked)} within tolerance")
+
+    save_outputs(clean, results, forecast_frames, timings, horizons)
+
+    print(f"✅ Model completed ({', '.join(str(h) for h in horizons)} days). Files updated in {OUT_DIR}")
+    time.sleep(0.5)
+
 
-print(f"✅ Model completed ({H} days). Files updated in {OUT_DIR}")
-time.sleep(0.5)
+if __name__ == "__main__":
+    main()
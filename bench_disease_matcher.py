@@ -0,0 +1,113 @@
+"""
+Micro-benchmark for count_disease_mentions
+
+Compares the single-pass combined matcher in news_fetcher.py against the
+previous implementation (one re.findall per disease) on synthetic articles
+of ~10k characters, and checks that both report the same counts once the
+overlap rule is applied ("flu" inside "avian flu"/"swine flu" is no longer
+counted twice).
+
+Usage:
+    python bench_disease_matcher.py --articles 300 --repeat 5
+"""
+import argparse
+import random
+import re
+import time
+
+from news_fetcher import all_diseases, count_disease_mentions
+
+FILLER = (
+    "health officials said the number of cases reported this week rose "
+    "in several regions while hospitals prepared for more patients and "
+    "the agency urged residents to follow guidance issued on monday"
+).split()
+
+
+def count_disease_mentions_per_pattern(text):
+    """Previous implementation: a separate regex scan per disease"""
+    if not text:
+        return 0, {}
+    text_lower = text.lower()
+    total_count = 0
+    breakdown = {}
+    for disease in all_diseases:
+        pattern = r'\b' + re.escape(disease.lower()) + r'\b'
+        match_count = len(re.findall(pattern, text_lower))
+        if match_count > 0:
+            breakdown[disease] = match_count
+            total_count += match_count
+    return total_count, breakdown
+
+
+def resolve_overlaps(breakdown):
+    """Apply the longest-match rule to a per-pattern breakdown"""
+    resolved = dict(breakdown)
+    nested = {}
+    for longer in all_diseases:
+        for shorter in all_diseases:
+            if shorter != longer and re.search(r'\b' + re.escape(shorter) + r'\b', longer):
+                nested[shorter] = nested.get(shorter, 0) + resolved.get(longer, 0)
+    for shorter, overlap in nested.items():
+        if shorter in resolved:
+            resolved[shorter] -= overlap
+            if resolved[shorter] <= 0:
+                del resolved[shorter]
+    return sum(resolved.values()), resolved
+
+
+def make_articles(n, length=10000, seed=42):
+    """Generate synthetic article texts with a sprinkling of disease terms"""
+    rng = random.Random(seed)
+    articles = []
+    for _ in range(n):
+        words = []
+        size = 0
+        while size < length:
+            if rng.random() < 0.02:
+                word = rng.choice(all_diseases)
+                if rng.random() < 0.3:
+                    word = word.title()
+            else:
+                word = rng.choice(FILLER)
+            words.append(word)
+            size += len(word) + 1
+        articles.append(" ".join(words)[:length])
+    return articles
+
+
+def bench(func, articles, repeat):
+    """Return the best wall time (seconds) of `repeat` runs over all articles"""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in articles:
+            func(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark count_disease_mentions")
+    ap.add_argument("--articles", type=int, default=300, help="Number of synthetic articles")
+    ap.add_argument("--repeat", type=int, default=5, help="Timing repetitions (best is reported)")
+    args = ap.parse_args()
+
+    articles = make_articles(args.articles)
+
+    mismatches = sum(
+        1 for text in articles
+        if count_disease_mentions(text) != resolve_overlaps(count_disease_mentions_per_pattern(text)[1])
+    )
+
+    old = bench(count_disease_mentions_per_pattern, articles, args.repeat)
+    new = bench(count_disease_mentions, articles, args.repeat)
+
+    print(f"Articles: {len(articles)} x ~10k chars, {len(all_diseases)} diseases")
+    print(f"Per-disease findall:  {old * 1000:8.1f} ms ({old / len(articles) * 1e6:7.1f} µs/article)")
+    print(f"Single-pass matcher:  {new * 1000:8.1f} ms ({new / len(articles) * 1e6:7.1f} µs/article)")
+    print(f"Speedup: {old / new:.1f}x | breakdown mismatches: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
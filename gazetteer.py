@@ -0,0 +1,176 @@
+"""
+Offline country gazetteer
+
+Loads country_gazetteer.csv (every ISO 3166 country with aliases, demonyms,
+ccTLD and centroid) once into hash indexes keyed by a normalized form of the
+name, so resolving a place string is a dict lookup instead of a scan over a
+hand-written country list. Shared by news_fetcher.py (country extraction)
+and the dashboard's pipeline_geo.py (coordinates).
+"""
+import os
+import re
+import csv
+import unicodedata
+from collections import namedtuple
+from functools import lru_cache
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+# The data file lives at the repository root; copies of this module in
+# sub-projects find it one level up. GAZETTEER_CSV overrides both.
+GAZETTEER_CSV = os.getenv("GAZETTEER_CSV") or next(
+    (p for p in (os.path.join(_HERE, "country_gazetteer.csv"),
+                 os.path.join(os.path.dirname(_HERE), "country_gazetteer.csv"))
+     if os.path.exists(p)),
+    os.path.join(_HERE, "country_gazetteer.csv"),
+)
+
+# ccTLDs mostly registered as generic/vanity domains (.io, .tv, .ai, ...),
+# which say nothing about where a news site is based
+GENERIC_CCTLDS = {"ai", "am", "cc", "co", "fm", "gg", "io", "la", "ly", "me", "nu", "tk", "to", "tv", "ws"}
+
+# Country names that in English-language news usually mean something else
+# (the US state of Georgia, New Jersey). A bare match on these only counts
+# with country-level context: one of the listed places or terms nearby
+AMBIGUOUS_NAMES = {
+    "georgia": {"tbilisi", "batumi", "kutaisi", "rustavi", "abkhazia", "ossetia", "caucasus"},
+    "jersey": {"saint helier", "channel islands", "guernsey"},
+}
+
+Country = namedtuple("Country", ["alpha2", "alpha3", "name", "lat", "lon", "tld"])
+
+
+def normalize_place(text):
+    """
+    Normalize a place string for lookups: strip accents and dots, unify
+    '&'/'and', hyphens and 'St'/'Saint', collapse whitespace, lowercase and
+    drop a leading 'the' ("the U.S." -> "us", "St Lucia" -> "saint lucia")
+    """
+    if text is None:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    text = text.lower().replace(".", "").replace("&", " and ")
+    text = re.sub(r"[-_/,()]+", " ", text)
+    text = re.sub(r"\bst\b", "saint", text)
+    text = re.sub(r"\s+", " ", text).strip()
+    if text.startswith("the "):
+        text = text[4:]
+    return text
+
+
+class Gazetteer:
+    """
+    Alias -> Country hash indexes built from the gazetteer CSV
+    - names: canonical names and aliases ("United States", "USA", "U.S.")
+    - demonyms: "American", "Nigerian", ...
+    - codes: ISO alpha-2 / alpha-3 codes ("us", "usa")
+    - tlds: ccTLDs without the dot ("uk", "jp")
+    """
+
+    def __init__(self, path=GAZETTEER_CSV):
+        self.countries = []
+        self.names = {}
+        self.demonyms = {}
+        self.codes = {}
+        self.tlds = {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                country = Country(
+                    row["alpha2"], row["alpha3"], row["name"],
+                    float(row["lat"]), float(row["lon"]), row["tld"],
+                )
+                self.countries.append(country)
+                for name in [row["name"]] + _split(row["aliases"]):
+                    self.names.setdefault(normalize_place(name), country)
+                for demonym in _split(row["demonyms"]):
+                    self.demonyms.setdefault(normalize_place(demonym), country)
+                self.codes[row["alpha2"].lower()] = country
+                self.codes[row["alpha3"].lower()] = country
+                if row["tld"]:
+                    self.tlds[row["tld"]] = country
+
+    def lookup(self, text, context=None, allow_ambiguous=False):
+        """
+        Country for a name or alias, or None. Ambiguous names ("Georgia",
+        "Jersey") only match when `context` (e.g. the article text) mentions
+        one of their country-level terms, or with allow_ambiguous
+        """
+        key = normalize_place(text)
+        country = self.names.get(key)
+        if country and key in AMBIGUOUS_NAMES and not allow_ambiguous:
+            padded = f" {normalize_place(context)} "
+            if not any(f" {term} " in padded for term in AMBIGUOUS_NAMES[key]):
+                return None
+        return country
+
+    def lookup_demonym(self, text):
+        """Country for a demonym ("Kenyan", "Filipinos"), or None"""
+        return self.demonyms.get(normalize_place(text))
+
+    def lookup_code(self, code):
+        """Country for an ISO alpha-2/alpha-3 code, or None"""
+        return self.codes.get(str(code).strip().lower()) if code else None
+
+    def lookup_domain(self, domain):
+        """Country for a host's ccTLD (www.bbc.co.uk -> United Kingdom), or None"""
+        if not domain:
+            return None
+        tld = domain.lower().split(":")[0].rstrip(".").rsplit(".", 1)[-1]
+        if tld in GENERIC_CCTLDS:
+            return None
+        return self.tlds.get(tld)
+
+    def resolve(self, value, context=None, allow_ambiguous=False):
+        """
+        Best match for a stored place value: name/alias, then ISO code,
+        then demonym; then each comma-separated part by name/alias only
+        ("Lagos, Nigeria"), so US-state abbreviations such as
+        "Atlanta, GA" are not read as ISO codes. allow_ambiguous (for
+        country-only fields) lets the whole value match "Georgia"; comma
+        parts always need context ("Tbilisi, Georgia", not "Atlanta, Georgia")
+        """
+        if value is None or not str(value).strip():
+            return None
+        value = str(value)
+        country = (self.lookup(value, context, allow_ambiguous) or self.lookup_code(value)
+                   or self.lookup_demonym(value))
+        if country:
+            return country
+        context = f"{value} {context or ''}"
+        for part in reversed(value.split(",")[1:]):
+            country = self.lookup(part, context)
+            if country:
+                return country
+        return None
+
+
+def _split(field):
+    return [item.strip() for item in (field or "").split("|") if item.strip()]
+
+
+@lru_cache(maxsize=1)
+def get_gazetteer():
+    """Process-wide Gazetteer, loaded on first use"""
+    return Gazetteer()
+
+
+def _self_check():
+    """python gazetteer.py: sanity checks for the alias and ambiguity rules"""
+    gaz = get_gazetteer()
+    name = lambda c: c.name if c else None
+    assert name(gaz.resolve("Lagos, Nigeria")) == "Nigeria"
+    assert name(gaz.resolve(" USA ")) == "United States"
+    assert name(gaz.resolve("Atlanta, GA")) is None
+    assert name(gaz.resolve("Atlanta, Georgia")) is None
+    assert name(gaz.resolve("Tbilisi, Georgia")) == "Georgia"
+    assert name(gaz.resolve("Republic of Georgia")) == "Georgia"
+    assert name(gaz.resolve("Georgia", allow_ambiguous=True)) == "Georgia"
+    assert name(gaz.lookup("Georgia")) is None
+    assert name(gaz.lookup("Georgia", context="Flooding in Tbilisi and Batumi")) == "Georgia"
+    assert name(gaz.lookup("Jersey")) is None
+    assert name(gaz.lookup_domain("www.example.ge")) == "Georgia"
+    print(f"✅ {len(gaz.countries)} countries, {len(gaz.names)} names, {len(gaz.demonyms)} demonyms")
+
+
+if __name__ == "__main__":
+    _self_check()
@@ -1,15 +1,28 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import spacy
 import psycopg2
-from datetime import datetime
+from psycopg2.extras import execute_values
+from datetime import datetime, timedelta, timezone
 import os
 from dotenv import load_dotenv
 import json
 import re
-from urllib.parse import urlparse
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 import time
+import sqlite3
+import threading
+import queue
+import zlib
+import multiprocessing
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from bs4 import BeautifulSoup
 
+from gazetteer import get_gazetteer
+
 # Try to import newspaper3k, but make it optional
 try:
     from newspaper import Article
@@ -26,9 +39,86 @@ API_KEY = os.getenv("NEWSAPI_KEY", "f5fb544ed1984e49b9ae342dccc4006c")
 # Database connection string from environment
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 
+# Bulk database writes: rows per INSERT statement, and what to do when an
+# article link is already stored ("skip" keeps the stored row, "update"
+# overwrites it with the newly fetched/analyzed values)
+DB_BATCH_SIZE = int(os.getenv("DB_BATCH_SIZE", "200"))
+DB_CONFLICT_POLICY = os.getenv("DB_CONFLICT_POLICY", "skip")
+
+# Drop articles whose link is already stored before downloading/analyzing them
+# (ignored when DB_CONFLICT_POLICY is "update", which needs to re-process them)
+SKIP_KNOWN_LINKS = os.getenv("SKIP_KNOWN_LINKS", "1") == "1"
+
+# NewsAPI paging: articles per page, max pages per query and run, and how far
+# before the stored per-query cursor to start (catches late-indexed articles;
+# repeats are dropped by the link checks)
+NEWSAPI_URL = "https://newsapi.org/v2/everything"
+NEWSAPI_PAGE_SIZE = int(os.getenv("NEWSAPI_PAGE_SIZE", "100"))
+NEWSAPI_MAX_PAGES = int(os.getenv("NEWSAPI_MAX_PAGES", "5"))
+NEWSAPI_CURSOR_OVERLAP_MINUTES = int(os.getenv("NEWSAPI_CURSOR_OVERLAP_MINUTES", "60"))
+
+# NewsAPI quotas: group queries run concurrently on NEWSAPI_QUERY_WORKERS
+# threads, sharing a token bucket of NEWSAPI_REQUESTS_PER_SECOND (bursts of
+# NEWSAPI_BURST) and a per-UTC-day request budget tracked across runs
+NEWSAPI_QUERY_WORKERS = int(os.getenv("NEWSAPI_QUERY_WORKERS", "4"))
+NEWSAPI_REQUESTS_PER_SECOND = float(os.getenv("NEWSAPI_REQUESTS_PER_SECOND", "1"))
+NEWSAPI_BURST = int(os.getenv("NEWSAPI_BURST", "2"))
+NEWSAPI_DAILY_QUOTA = int(os.getenv("NEWSAPI_DAILY_QUOTA", "100"))
+
+# Download stage settings: total concurrent downloads, concurrent downloads
+# allowed against a single host, and minimum spacing between requests to a host
+FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "8"))
+PER_HOST_CONCURRENCY = int(os.getenv("PER_HOST_CONCURRENCY", "1"))
+PER_HOST_DELAY = float(os.getenv("PER_HOST_DELAY", "0.5"))
+
+# HTTP connection pooling and retry settings shared by all outbound requests
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "32"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", str(max(FETCH_WORKERS, 4))))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+# Longest Retry-After (seconds) a 429/503 may make a worker sleep before retrying
+HTTP_MAX_RETRY_AFTER = float(os.getenv("HTTP_MAX_RETRY_AFTER", "30"))
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+# Local cache of extracted article bodies, keyed by normalized URL
+# (set ARTICLE_CACHE_PATH to an empty string to disable it). Entries younger
+# than the TTL are served without any request; older ones are revalidated with
+# ETag/If-Modified-Since. Entries not used for ARTICLE_CACHE_MAX_AGE_DAYS, or
+# beyond ARTICLE_CACHE_MAX_MB in total, are evicted (least recently used first).
+# ARTICLE_CACHE_OFFLINE=1 serves everything from the cache and never downloads.
+ARTICLE_CACHE_PATH = os.getenv(
+    "ARTICLE_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "article_cache.sqlite3")
+)
+ARTICLE_CACHE_TTL_DAYS = float(os.getenv("ARTICLE_CACHE_TTL_DAYS", "7"))
+ARTICLE_CACHE_MAX_AGE_DAYS = float(os.getenv("ARTICLE_CACHE_MAX_AGE_DAYS", "90"))
+ARTICLE_CACHE_MAX_MB = float(os.getenv("ARTICLE_CACHE_MAX_MB", "500"))
+ARTICLE_CACHE_OFFLINE = os.getenv("ARTICLE_CACHE_OFFLINE", "0") == "1"
+
+# Checkpointed runs: an unfinished run (killed or failed) is resumed by the next
+# start if it began less than RUN_RESUME_MAX_AGE_HOURS ago; older ones are abandoned
+RUN_RESUME_MAX_AGE_HOURS = float(os.getenv("RUN_RESUME_MAX_AGE_HOURS", "24"))
+
+# Streaming pipeline: capacity of the bounded queues between stages, and how
+# many processed articles the DB writer collects before each write + commit
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "200"))
+DB_COMMIT_EVERY = int(os.getenv("DB_COMMIT_EVERY", "50"))
+
+# spaCy batch size for the batched NLP stage
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "32"))
+
+# Optional multi-process NLP: number of worker processes (1 = in-process)
+# and how many articles are analyzed per task (also the NLP stage batch size)
+NLP_WORKERS = int(os.getenv("NLP_WORKERS", "1"))
+NLP_CHUNK_SIZE = int(os.getenv("NLP_CHUNK_SIZE", "64"))
+
+# Only the NER component is used (entities for scoring and country extraction),
+# so the tagger/parser/lemmatizer and their shared tok2vec are never loaded
+NLP_EXCLUDE = ["tok2vec", "tagger", "parser", "senter", "attribute_ruler", "lemmatizer"]
+
 # Initialize spaCy model (load once, reuse)
 try:
-    nlp = spacy.load("en_core_web_sm")
+    nlp = spacy.load("en_core_web_sm", exclude=NLP_EXCLUDE)
 except OSError:
     print("⚠️  spaCy model 'en_core_web_sm' not found. Installing...")
     print("   Run: python -m spacy download en_core_web_sm")
@@ -47,6 +137,24 @@ all_diseases = []
 for group in groups:
     all_diseases.extend(group)
 
+def build_disease_matcher(diseases):
+    """
+    Compile a disease vocabulary into a single word-bounded alternation regex
+    Longer terms come first, so where terms overlap the longest one wins
+    (e.g. "avian flu" is counted as "avian flu", not also as "flu")
+    Returns (compiled_pattern, {lowercase_term: disease})
+    """
+    terms = {d.lower(): d for d in diseases}
+    ordered = sorted(terms, key=lambda t: (-len(t), t))
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(t) for t in ordered) + r')\b')
+    return pattern, terms
+
+# Single-pass matcher for the whole disease vocabulary
+disease_pattern, disease_terms = build_disease_matcher(all_diseases)
+
+# Offline country gazetteer (alias/demonym/ccTLD -> country hash indexes)
+gazetteer = get_gazetteer()
+
 # Keywords for NLP analysis
 health_keywords = [
     "outbreak", "cases", "hospital", "disease", "ICU", "virus", "infection",
@@ -54,6 +162,12 @@ health_keywords = [
     "quarantine", "epidemic", "transmission", "hospitalization", "pandemic"
 ]
 
+# Post-filter for health relevance (matched against title + description)
+relevant_terms = [
+    "outbreak", "cases", "hospital", "disease", "ICU", "virus", "infection",
+    "symptoms", "diagnosed", "CDC", "WHO", "sick", "illness", "health alert", "quarantine", "epidemic"
+]
+
 context_terms = "outbreak OR infection OR epidemic OR cases OR symptoms OR hospitalization OR transmission OR health alert OR disease OR CDC OR WHO OR quarantine"
 exclude_terms = "NOT vaccine NOT politics NOT sports NOT costume NOT photography NOT Halloween NOT movie"
 
@@ -137,22 +251,615 @@ def create_table_if_not_exists(conn):
     # Create GIN index on disease_breakdown for efficient JSON queries
     cursor.execute("CREATE INDEX IF NOT EXISTS idx_disease_breakdown ON articles USING GIN (disease_breakdown);")
     
+    # Per-query high-water marks for incremental NewsAPI fetching
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS newsapi_cursors (
+            query TEXT PRIMARY KEY,
+            last_published_at TIMESTAMPTZ NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    
+    # NewsAPI requests used per UTC day, shared by all runs
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS newsapi_quota (
+            day DATE PRIMARY KEY,
+            requests_used INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    
+    # Ingestion run checkpoints: one row per run plus per-article progress, so an
+    # interrupted run can be resumed (see IngestionRun)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ingestion_runs (
+            id SERIAL PRIMARY KEY,
+            started_at TIMESTAMPTZ DEFAULT NOW(),
+            finished_at TIMESTAMPTZ,
+            status TEXT NOT NULL DEFAULT 'running',
+            completed_queries JSONB NOT NULL DEFAULT '{}'::jsonb
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ingestion_progress (
+            run_id INTEGER NOT NULL REFERENCES ingestion_runs(id) ON DELETE CASCADE,
+            link TEXT NOT NULL,
+            stage TEXT NOT NULL,
+            article JSONB NOT NULL,
+            analysis JSONB,
+            updated_at TIMESTAMPTZ DEFAULT NOW(),
+            PRIMARY KEY (run_id, link)
+        );
+    """)
+    
+    conn.commit()
+    cursor.close()
+
+def load_quota_used(conn, day):
+    """Return how many NewsAPI requests have already been used on `day`"""
+    cursor = conn.cursor()
+    cursor.execute("SELECT requests_used FROM newsapi_quota WHERE day = %s", (day,))
+    row = cursor.fetchone()
+    cursor.close()
+    return row[0] if row else 0
+
+def record_quota_used(conn, day, requests):
+    """Add this run's NewsAPI request count to the stored usage for `day`"""
+    if not requests:
+        return
+    cursor = conn.cursor()
+    cursor.execute("""
+        INSERT INTO newsapi_quota (day, requests_used) VALUES (%s, %s)
+        ON CONFLICT (day) DO UPDATE SET requests_used = newsapi_quota.requests_used + EXCLUDED.requests_used
+    """, (day, requests))
+    conn.commit()
+    cursor.close()
+
+def load_query_cursors(conn):
+    """
+    Load the per-query NewsAPI cursors (newest publishedAt already ingested)
+    Returns a dict {query: datetime}
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT query, last_published_at FROM newsapi_cursors")
+    cursors = dict(cursor.fetchall())
+    cursor.close()
+    return cursors
+
+def save_query_cursors(conn, newest_by_query):
+    """Advance the stored cursor of each query to the newest publishedAt seen (never moves backwards)"""
+    if not newest_by_query:
+        return
+    cursor = conn.cursor()
+    execute_values(cursor, """
+        INSERT INTO newsapi_cursors (query, last_published_at) VALUES %s
+        ON CONFLICT (query) DO UPDATE SET
+            last_published_at = GREATEST(newsapi_cursors.last_published_at, EXCLUDED.last_published_at),
+            updated_at = CURRENT_TIMESTAMP
+    """, list(newest_by_query.items()))
     conn.commit()
     cursor.close()
 
-def fetch_article_content(url, timeout=10):
+class IngestionRun:
+    """
+    Checkpoint log for one ingestion run (ingestion_runs / ingestion_progress)
+    Each article is recorded as it moves through the stages
+    (queued -> fetched -> analyzed -> saved), together with the NewsAPI queries
+    that completed. A run that is killed or fails keeps status 'running'/'failed'
+    and is picked up by the next start, which skips completed queries and saved
+    articles, reuses stored analyses, and takes fetched bodies from the article
+    cache instead of downloading them again
+    Uses its own connection, so it can be called from any pipeline stage
+    """
+    
+    STAGES = ("queued", "fetched", "analyzed", "saved")
+    
+    def __init__(self, conn, run_id, completed_queries=None, progress=None):
+        self.conn = conn
+        self.run_id = run_id
+        self.completed_queries = completed_queries or {}
+        self.progress = progress or []
+        self.lock = threading.Lock()
+    
+    @property
+    def resumed(self):
+        return bool(self.completed_queries or self.progress)
+    
+    @classmethod
+    def start(cls, resume=True, max_age_hours=RUN_RESUME_MAX_AGE_HOURS):
+        """
+        Resume the latest unfinished run (if `resume` and it is recent enough)
+        or register a new one
+        """
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        run = None
+        if resume:
+            cursor.execute("""
+                SELECT id, completed_queries FROM ingestion_runs
+                WHERE status IN ('running', 'failed') AND started_at > NOW() - %s * INTERVAL '1 hour'
+                ORDER BY id DESC LIMIT 1
+            """, (max_age_hours,))
+            row = cursor.fetchone()
+            if row:
+                run_id, completed = row
+                cursor.execute(
+                    "SELECT stage, article, analysis FROM ingestion_progress WHERE run_id = %s",
+                    (run_id,)
+                )
+                completed_queries = {
+                    query: datetime.fromisoformat(newest) if newest else None
+                    for query, newest in completed.items()
+                }
+                run = cls(conn, run_id, completed_queries, cursor.fetchall())
+        # Anything else left unfinished will not be resumed
+        cursor.execute("""
+            UPDATE ingestion_runs SET status = 'abandoned', finished_at = NOW()
+            WHERE status IN ('running', 'failed') AND id <> %s
+        """, (run.run_id if run else -1,))
+        if run:
+            cursor.execute("UPDATE ingestion_runs SET status = 'running' WHERE id = %s", (run.run_id,))
+        else:
+            cursor.execute("INSERT INTO ingestion_runs DEFAULT VALUES RETURNING id")
+            run = cls(conn, cursor.fetchone()[0])
+        conn.commit()
+        cursor.close()
+        return run
+    
+    def record(self, stage, items):
+        """Checkpoint a batch of articles at `stage`; items are (article, analysis or None) pairs"""
+        rows = [
+            (self.run_id, a['url'], stage, json.dumps(a), json.dumps(analysis) if analysis is not None else None)
+            for a, analysis in items if a.get('url')
+        ]
+        if not rows:
+            return
+        with self.lock:
+            cursor = self.conn.cursor()
+            execute_values(cursor, """
+                INSERT INTO ingestion_progress (run_id, link, stage, article, analysis) VALUES %s
+                ON CONFLICT (run_id, link) DO UPDATE SET
+                    stage = EXCLUDED.stage,
+                    analysis = COALESCE(EXCLUDED.analysis, ingestion_progress.analysis),
+                    updated_at = NOW()
+            """, rows)
+            self.conn.commit()
+            cursor.close()
+    
+    def complete_query(self, query, newest):
+        """Checkpoint a NewsAPI query whose pages have all been queued"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute("""
+                UPDATE ingestion_runs SET completed_queries = completed_queries || %s::jsonb
+                WHERE id = %s
+            """, (json.dumps({query: newest.isoformat() if newest else None}), self.run_id))
+            self.conn.commit()
+            cursor.close()
+    
+    def finish(self, status):
+        """Close the run; a completed run's per-article progress is no longer needed"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            cursor.execute(
+                "UPDATE ingestion_runs SET status = %s, finished_at = NOW() WHERE id = %s",
+                (status, self.run_id)
+            )
+            if status == "completed":
+                cursor.execute("DELETE FROM ingestion_progress WHERE run_id = %s", (self.run_id,))
+            self.conn.commit()
+            cursor.close()
+            self.conn.close()
+
+class CappedRetry(Retry):
+    """
+    urllib3 Retry that honors Retry-After but sleeps at most `max_retry_after`
+    seconds, so one "Retry-After: 3600" can't stall a worker for an hour
+    """
+    max_retry_after = HTTP_MAX_RETRY_AFTER
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.max_retry_after)
+
+def create_http_session(pool_hosts=HTTP_POOL_HOSTS, pool_size=HTTP_POOL_SIZE,
+                        retries=HTTP_RETRIES, backoff=HTTP_BACKOFF):
+    """
+    Create a requests Session with pooled keep-alive connections.
+    Keeps up to `pool_hosts` per-host pools of `pool_size` connections each and
+    retries 429/5xx responses and connection errors with exponential backoff,
+    honoring the server's Retry-After header up to HTTP_MAX_RETRY_AFTER seconds
+    """
+    retry = CappedRetry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({'User-Agent': USER_AGENT})
+    return session
+
+# Shared session used by every outbound request (NewsAPI and article downloads)
+http_session = create_http_session()
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ocid", "cmpid"}
+
+def normalize_url(url):
+    """
+    Normalize a URL for use as a cache key: lowercase scheme and host, drop
+    default ports, fragments and tracking parameters (utm_*, fbclid, ...),
+    and sort the remaining query parameters
+    """
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not (scheme == "http" and parts.port == 80) and not (scheme == "https" and parts.port == 443):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    )
+    return urlunparse((scheme, host, parts.path or "/", parts.params, urlencode(query), ""))
+
+class ArticleCache:
+    """
+    SQLite-backed cache of extracted article text keyed by normalized URL
+    Stores the text (zlib-compressed) with the HTTP validators (ETag,
+    Last-Modified) needed for conditional refreshes. A NULL body records a page
+    that was downloaded but had no extractable text. Safe to share between the
+    download threads.
+    """
+    
+    def __init__(self, path, ttl_days=ARTICLE_CACHE_TTL_DAYS,
+                 max_age_days=ARTICLE_CACHE_MAX_AGE_DAYS, max_mb=ARTICLE_CACHE_MAX_MB):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.ttl_seconds = ttl_days * 86400
+        self.max_age_seconds = max_age_days * 86400
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS article_cache (
+                    url_key TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    content BLOB,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed_at ON article_cache(accessed_at)")
+            self.conn.commit()
+    
+    def get(self, url):
+        """
+        Look up a cached entry and mark it as recently used
+        Returns a dict (content, etag, last_modified, fetched_at, fresh) or None
+        """
+        key = normalize_url(url)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content, etag, last_modified, fetched_at FROM article_cache WHERE url_key = ?",
+                (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE article_cache SET accessed_at = ? WHERE url_key = ?", (now, key))
+            self.conn.commit()
+        content, etag, last_modified, fetched_at = row
+        return {
+            'content': zlib.decompress(content).decode('utf-8') if content is not None else None,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fetched_at': fetched_at,
+            'fresh': now - fetched_at < self.ttl_seconds,
+        }
+    
+    def put(self, url, content, etag=None, last_modified=None):
+        """Store (or replace) the extracted text and validators for a URL"""
+        blob = zlib.compress(content.encode('utf-8')) if content is not None else None
+        now = time.time()
+        with self.lock:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO article_cache
+                    (url_key, url, content, etag, last_modified, fetched_at, accessed_at, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (normalize_url(url), url, blob, etag, last_modified, now, now, len(blob or b"")))
+            self.conn.commit()
+    
+    def mark_revalidated(self, url):
+        """Reset the freshness clock of an entry after a 304 Not Modified response"""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE article_cache SET fetched_at = ? WHERE url_key = ?",
+                (time.time(), normalize_url(url))
+            )
+            self.conn.commit()
+    
+    def evict(self):
+        """
+        Remove entries unused for longer than max_age_days, then the least
+        recently used entries until the cache fits in max_mb
+        Returns the number of evicted entries
+        """
+        with self.lock:
+            cursor = self.conn.execute(
+                "DELETE FROM article_cache WHERE accessed_at < ?",
+                (time.time() - self.max_age_seconds,)
+            )
+            evicted = cursor.rowcount
+            total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM article_cache").fetchone()[0]
+            if total > self.max_bytes:
+                excess = total - self.max_bytes
+                stale_keys = []
+                for key, size in self.conn.execute("SELECT url_key, size FROM article_cache ORDER BY accessed_at"):
+                    if excess <= 0:
+                        break
+                    stale_keys.append((key,))
+                    excess -= size
+                self.conn.executemany("DELETE FROM article_cache WHERE url_key = ?", stale_keys)
+                evicted += len(stale_keys)
+            self.conn.commit()
+        return evicted
+
+def open_article_cache():
+    """Open the configured article cache, or return None if it is disabled/unavailable"""
+    if not ARTICLE_CACHE_PATH:
+        return None
+    try:
+        return ArticleCache(ARTICLE_CACHE_PATH)
+    except Exception as e:
+        print(f"⚠️  Article cache unavailable ({e}), downloading without it")
+        return None
+
+article_cache = open_article_cache()
+
+def extract_text_from_html(html):
+    """
+    Extract the main article text from raw HTML using BeautifulSoup
+    Returns cleaned text limited to 10000 characters
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+    
+    # Remove script, style, and other non-content elements
+    for element in soup(["script", "style", "nav", "header", "footer", "aside", "advertisement", "ads"]):
+        element.decompose()
+    
+    # Try to find main article content
+    # Look for common article containers
+    article_content = None
+    for selector in ['article', '.article', '#article', '.content', '.post-content', '.entry-content', 'main', '.main-content']:
+        article_content = soup.select_one(selector)
+        if article_content:
+            break
+    
+    # If no specific article container found, use body
+    if not article_content:
+        article_content = soup.find('body') or soup
+    
+    # Get text
+    text = article_content.get_text(separator=' ', strip=True)
+    
+    # Clean up excessive whitespace
+    text = ' '.join(text.split())
+    
+    # Return text (limit to reasonable size)
+    return text[:10000]  # Limit to first 10000 chars
+
+class NewsApiLimiter:
+    """
+    Token bucket shared by the NewsAPI query threads
+    Allows `per_second` requests per second with bursts of up to `burst`, and
+    stops handing out tokens once `daily_quota` requests (including those made
+    by earlier runs today, `used_today`) have been spent
+    """
+    
+    def __init__(self, per_second=NEWSAPI_REQUESTS_PER_SECOND, burst=NEWSAPI_BURST,
+                 daily_quota=NEWSAPI_DAILY_QUOTA, used_today=0):
+        self.per_second = per_second
+        self.burst = max(1, burst)
+        self.remaining = max(0, daily_quota - used_today)
+        self.used = 0
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """
+        Block until a request may be sent
+        Returns False (without blocking) when the daily quota is used up
+        """
+        while True:
+            with self.lock:
+                if self.remaining <= 0:
+                    return False
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.per_second)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.remaining -= 1
+                    self.used += 1
+                    return True
+                wait = (1 - self.tokens) / self.per_second if self.per_second > 0 else 1.0
+            time.sleep(wait)
+    
+    def exhaust(self):
+        """Stop all further requests (NewsAPI reported the quota as used up)"""
+        with self.lock:
+            self.remaining = 0
+
+def parse_published_at(article):
+    """Parse a NewsAPI publishedAt value into an aware datetime, or None"""
+    try:
+        return datetime.fromisoformat((article.get('publishedAt') or '').replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+def build_group_query(disease_group):
+    """Build the NewsAPI search query for a group of diseases"""
+    diseases_or = " OR ".join(disease_group)
+    return f"({diseases_or}) AND ({context_terms}) {exclude_terms}"
+
+def fetch_newsapi_articles(query, since=None, max_pages=NEWSAPI_MAX_PAGES, page_size=NEWSAPI_PAGE_SIZE,
+                           limiter=None, on_page=None):
+    """
+    Fetch articles for one NewsAPI query, newest first, following pagination
+    With `since` (the query's cursor) only articles published after it (minus a
+    small overlap) are requested, and paging stops once the cursor is reached
+    Each page request first takes a token from `limiter`, if given
+    With `on_page`, each page's articles are handed to it as they arrive instead
+    of being collected (returning False from it stops paging)
+    Returns a tuple: (articles, ok) where ok is False if a request failed part-way
+    or max_pages ran out before the cursor was reached, in which case the
+    query's cursor should not be advanced
+    """
+    params = {
+        'q': query,
+        'language': 'en',
+        'sortBy': 'publishedAt',
+        'pageSize': page_size,
+        'apiKey': API_KEY,
+    }
+    if since:
+        start = since - timedelta(minutes=NEWSAPI_CURSOR_OVERLAP_MINUTES)
+        params['from'] = start.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+    
+    articles = []
+    fetched = 0
+    ok = True
+    pages = 0
+    for page in range(1, max_pages + 1):
+        params['page'] = page
+        if limiter and not limiter.acquire():
+            print("  ⚠ NewsAPI daily quota used up, stopping this query")
+            ok = False
+            break
+        try:
+            response = http_session.get(NEWSAPI_URL, params=params, timeout=30)
+            data = response.json()
+        except Exception as e:
+            print(f"Error fetching news: {e}")
+            ok = False
+            break
+        if data.get('status') != 'ok' or 'articles' not in data:
+            print("Error or no articles returned:", data)
+            if limiter and data.get('code') == 'rateLimited':
+                limiter.exhaust()
+            # Limited plans stop paging with maximumResultsReached; what we have is all we can get
+            ok = data.get('code') == 'maximumResultsReached'
+            break
+        
+        pages = page
+        page_articles = data['articles']
+        fetched += len(page_articles)
+        if on_page is None:
+            articles.extend(page_articles)
+        elif on_page(page_articles) is False:
+            ok = False
+            break
+        
+        oldest = parse_published_at(page_articles[-1]) if page_articles else None
+        if since and oldest and oldest < since:
+            break
+        if len(page_articles) < page_size or page * page_size >= data.get('totalResults', 0):
+            break
+    else:
+        # Page cap hit while newer articles than the cursor remain: advancing it
+        # would skip everything between the cursor and the oldest page fetched
+        if since:
+            print(f"  ⚠ Stopped after {max_pages} pages before reaching the cursor; keeping it "
+                  f"(raise NEWSAPI_MAX_PAGES to ingest everything)")
+            ok = False
+    
+    print(f"  {fetched} articles in {pages} page(s)" + (f" since {since:%Y-%m-%d %H:%M}" if since else ""))
+    return articles, ok
+
+def fetch_article_content(url, timeout=10, session=None, cache=None):
     """
     Fetch full article content from URL using newspaper3k or BeautifulSoup fallback
+    The page is downloaded once through the shared pooled session and the same
+    HTML is handed to both parsers. Results go through the article cache:
+    fresh entries are returned without a request, stale ones are refreshed with
+    a conditional request, and a failed refresh falls back to the cached text
     Returns article text or None if fetching fails
     """
     if not url:
         return None
     
+    cache = cache or article_cache
+    entry = cache.get(url) if cache else None
+    if entry and (entry['fresh'] or ARTICLE_CACHE_OFFLINE):
+        return entry['content']
+    if ARTICLE_CACHE_OFFLINE:
+        return None
+    
+    # Revalidate a stale cached copy instead of downloading it again
+    headers = {}
+    if entry:
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+    
+    session = session or http_session
+    try:
+        response = session.get(url, timeout=timeout, headers=headers)
+        if response.status_code == 304 and entry:
+            cache.mark_revalidated(url)
+            return entry['content']
+        if response.status_code != 200:
+            return entry['content'] if entry else None
+        html = response_html(response)
+    except Exception:
+        return entry['content'] if entry else None
+    
+    text = extract_article_text(url, html)
+    if cache:
+        cache.put(url, text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+    return text
+
+def response_html(response):
+    """
+    Page HTML for the parsers, decoded the way newspaper3k's own download does:
+    use the charset from the Content-Type header, else a charset declared in the
+    page, else hand over the raw bytes so the parsers detect the encoding
+    (requests would otherwise assume ISO-8859-1 and garble UTF-8 pages)
+    """
+    if 'charset' in response.headers.get('Content-Type', '').lower():
+        return response.text
+    encodings = requests.utils.get_encodings_from_content(response.content.decode('ascii', 'ignore'))
+    if encodings:
+        response.encoding = encodings[0]
+        return response.text
+    return response.content
+
+def extract_article_text(url, html):
+    """
+    Extract article text from downloaded HTML using newspaper3k or BeautifulSoup fallback
+    Returns article text or None if nothing could be extracted
+    """
     # Try newspaper3k first if available
     if NEWSPAPER_AVAILABLE:
         try:
             article = Article(url)
-            article.download()
+            article.download(input_html=html)
             article.parse()
             if article.text:
                 return article.text
@@ -162,113 +869,138 @@ def fetch_article_content(url, timeout=10):
     
     # Fallback to BeautifulSoup method
     try:
-        response = requests.get(url, timeout=timeout, headers={
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
-        if response.status_code == 200:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove script, style, and other non-content elements
-            for element in soup(["script", "style", "nav", "header", "footer", "aside", "advertisement", "ads"]):
-                element.decompose()
-            
-            # Try to find main article content
-            # Look for common article containers
-            article_content = None
-            for selector in ['article', '.article', '#article', '.content', '.post-content', '.entry-content', 'main', '.main-content']:
-                article_content = soup.select_one(selector)
-                if article_content:
-                    break
-            
-            # If no specific article container found, use body
-            if not article_content:
-                article_content = soup.find('body') or soup
-            
-            # Get text
-            text = article_content.get_text(separator=' ', strip=True)
-            
-            # Clean up excessive whitespace
-            text = ' '.join(text.split())
-            
-            # Return text (limit to reasonable size)
-            return text[:10000]  # Limit to first 10000 chars
-    except Exception as e:
+        return extract_text_from_html(html) or None
+    except Exception:
         pass
     
     return None
 
+class HostScheduler:
+    """
+    Bounded work queue for the download stage with per-host politeness limits
+    An article is only handed out when its host has fewer than
+    `per_host_concurrency` downloads in flight and its previous download ended
+    at least `per_host_delay` seconds ago, so workers move on to other hosts
+    instead of queueing up behind one slow host. put() blocks while `maxsize`
+    articles are waiting
+    """
+    
+    def __init__(self, maxsize=PIPELINE_QUEUE_SIZE, per_host_concurrency=PER_HOST_CONCURRENCY,
+                 per_host_delay=PER_HOST_DELAY, stop=None):
+        self.maxsize = max(1, maxsize)
+        self.per_host_concurrency = max(1, per_host_concurrency)
+        self.per_host_delay = per_host_delay
+        self.stop = stop or threading.Event()
+        self.cond = threading.Condition()
+        self.pending = {}       # host -> deque of waiting articles
+        self.active = {}        # host -> downloads in flight
+        self.next_allowed = {}  # host -> earliest time.monotonic() for the next request
+        self.size = 0
+        self.closed = False
+    
+    def put(self, host, item):
+        """Queue an item for `host`; returns False if the pipeline is stopping"""
+        with self.cond:
+            while self.size >= self.maxsize and not self.stop.is_set():
+                self.cond.wait(0.5)
+            if self.stop.is_set():
+                return False
+            self.pending.setdefault(host, deque()).append(item)
+            self.size += 1
+            self.cond.notify_all()
+            return True
+    
+    def close(self):
+        """No more items will be queued; get() returns None once the queue drains"""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+    
+    def get(self):
+        """
+        Block until an item whose host may be contacted is available
+        Returns (host, item), or None once closed and drained (or stopping)
+        """
+        with self.cond:
+            while not self.stop.is_set():
+                now = time.monotonic()
+                ready_host = None
+                wait = 0.5
+                for host, items in self.pending.items():
+                    if self.active.get(host, 0) >= self.per_host_concurrency:
+                        continue
+                    ready_at = self.next_allowed.get(host, now)
+                    if ready_at > now:
+                        wait = min(wait, ready_at - now)
+                    # Prefer the host with the most waiting articles
+                    elif ready_host is None or len(items) > len(self.pending[ready_host]):
+                        ready_host = host
+                if ready_host is not None:
+                    items = self.pending[ready_host]
+                    item = items.popleft()
+                    if not items:
+                        del self.pending[ready_host]
+                    self.active[ready_host] = self.active.get(ready_host, 0) + 1
+                    self.size -= 1
+                    self.cond.notify_all()
+                    return ready_host, item
+                if self.closed and self.size == 0:
+                    return None
+                self.cond.wait(wait)
+            return None
+    
+    def done(self, host):
+        """Mark a download from `host` as finished and start its politeness delay"""
+        with self.cond:
+            self.active[host] -= 1
+            self.next_allowed[host] = time.monotonic() + self.per_host_delay
+            self.cond.notify_all()
+
 def count_disease_mentions(text):
     """
     Count how many times diseases are mentioned in the article text
+    Scans the text once with the combined disease matcher; overlapping terms
+    resolve to the longest match
     Returns a tuple: (total_count, breakdown_dict)
     breakdown_dict contains {disease_name: count} for each disease found
     """
     if not text:
         return 0, {}
     
-    text_lower = text.lower()
-    total_count = 0
-    breakdown = {}
-    
-    # Count occurrences of each disease in the text
-    for disease in all_diseases:
-        disease_lower = disease.lower()
-        # For multi-word diseases (like "avian flu"), use a more flexible pattern
-        if ' ' in disease_lower:
-            # For phrases, use word boundaries at start and end
-            pattern = r'\b' + re.escape(disease_lower) + r'\b'
-        else:
-            # For single words, use word boundaries
-            pattern = r'\b' + re.escape(disease_lower) + r'\b'
-        
-        matches = re.findall(pattern, text_lower)
-        match_count = len(matches)
-        
-        if match_count > 0:
-            # Store the count for this disease (use original case from all_diseases)
-            breakdown[disease] = match_count
-            total_count += match_count
+    counts = {}
+    for match in disease_pattern.finditer(text.lower()):
+        disease = disease_terms[match.group(0)]
+        counts[disease] = counts.get(disease, 0) + 1
+    
+    # Report diseases in vocabulary order (use original case from all_diseases)
+    breakdown = {disease: counts[disease] for disease in all_diseases if disease in counts}
+    total_count = sum(breakdown.values())
     
     return total_count, breakdown
 
-def extract_country_from_article(text, article_data=None, url=None):
+def extract_country_from_article(text, article_data=None, url=None, doc=None):
     """
     Extract country/geolocation from article text using NLP
     Also checks article_data, URL domain, and source for country information
-    Returns country name or None
+    An already parsed spaCy `doc` for the text can be passed to avoid re-parsing
+    Names, aliases, demonyms and ccTLDs are resolved through the offline
+    gazetteer (country_gazetteer.csv), so every lookup is a dict hit
+    Returns canonical country name or None
     """
     # First, check if NewsAPI provides country information in the article data
     if article_data:
         country = article_data.get('country') or article_data.get('countryCode')
         if country:
-            return country
+            # a country field, so "Georgia" here is the country
+            match = gazetteer.resolve(country, allow_ambiguous=True)
+            return match.name if match else country
     
-    # Check URL domain for country hints (e.g., .co.uk, .com.au, .ca, etc.)
+    # Check URL domain for a country-code TLD (e.g., .co.uk, .com.au, .ca)
     if url:
         try:
-            domain = urlparse(url).netloc.lower()
-            # Common country domain patterns
-            country_domains = {
-                '.co.uk': 'United Kingdom',
-                '.com.au': 'Australia',
-                '.ca': 'Canada',
-                '.co.za': 'South Africa',
-                '.co.nz': 'New Zealand',
-                '.ie': 'Ireland',
-                '.in': 'India',
-                '.jp': 'Japan',
-                '.cn': 'China',
-                '.de': 'Germany',
-                '.fr': 'France',
-                '.it': 'Italy',
-                '.es': 'Spain',
-                '.br': 'Brazil',
-                '.mx': 'Mexico',
-                '.ar': 'Argentina',
-            }
-            for domain_suffix, country_name in country_domains.items():
-                if domain_suffix in domain:
-                    return country_name
+            match = gazetteer.lookup_domain(urlparse(url).netloc)
+            if match:
+                return match.name
         except:
             pass
     
@@ -292,61 +1024,31 @@ def extract_country_from_article(text, article_data=None, url=None):
         return None
     
     # Use spaCy to extract geographic entities from text
-    doc = nlp(text)
-    countries = []
+    if doc is None:
+        doc = nlp(text)
     country_priority = {}  # Track frequency and position
     
-    # Common country names to look for
-    common_countries = [
-        'United States', 'USA', 'US', 'America',
-        'United Kingdom', 'UK', 'Britain',
-        'Canada', 'Australia', 'New Zealand',
-        'India', 'China', 'Japan', 'South Korea',
-        'Germany', 'France', 'Italy', 'Spain',
-        'Brazil', 'Mexico', 'Argentina',
-        'South Africa', 'Nigeria', 'Kenya',
-        'Russia', 'Ukraine', 'Poland',
-    ]
-    
-    # Extract GPE (Geopolitical Entity) entities which include countries
+    # GPE (Geopolitical Entity) entities are matched against country names and
+    # aliases ("U.S.", "Britain"); NORP entities against demonyms ("Kenyan")
     for i, ent in enumerate(doc.ents):
         if ent.label_ == "GPE":
-            ent_text = ent.text.strip()
-            ent_lower = ent_text.lower()
-            
-            # Map common abbreviations and variations
-            country_map = {
-                'us': 'United States',
-                'usa': 'United States',
-                'u.s.': 'United States',
-                'u.s.a.': 'United States',
-                'united states': 'United States',
-                'america': 'United States',
-                'uk': 'United Kingdom',
-                'u.k.': 'United Kingdom',
-                'united kingdom': 'United Kingdom',
-                'britain': 'United Kingdom',
-                'england': 'United Kingdom',
-            }
-            
-            # Check if it's a known country or variation
-            if ent_lower in country_map:
-                country_name = country_map[ent_lower]
-            elif ent_text in common_countries or any(cc.lower() in ent_lower for cc in common_countries):
-                country_name = ent_text
-            else:
-                # Check if it matches any common country (case-insensitive)
-                for cc in common_countries:
-                    if cc.lower() == ent_lower or cc.lower() in ent_lower or ent_lower in cc.lower():
-                        country_name = cc
-                        break
-                else:
-                    continue  # Skip if not a recognized country
+            # Ambiguous names ("Georgia") need country-level context in the text
+            match = gazetteer.lookup(ent.text, context=text)
+            if match is None and "," in ent.text:
+                # "Lagos, Nigeria": try the trailing parts
+                match = gazetteer.resolve(ent.text, context=text)
+        elif ent.label_ == "NORP":
+            match = gazetteer.lookup_demonym(ent.text)
+        else:
+            continue
+        if match is None:
+            continue  # Skip if not a recognized country
+        country_name = match.name
             
-            # Track priority (earlier mentions are more likely to be the main country)
-            if country_name not in country_priority:
-                country_priority[country_name] = {'count': 0, 'first_pos': i}
-            country_priority[country_name]['count'] += 1
+        # Track priority (earlier mentions are more likely to be the main country)
+        if country_name not in country_priority:
+            country_priority[country_name] = {'count': 0, 'first_pos': i}
+        country_priority[country_name]['count'] += 1
     
     # Return the most frequently mentioned country, or the first one if tied
     if country_priority:
@@ -359,15 +1061,17 @@ def extract_country_from_article(text, article_data=None, url=None):
     
     return None
 
-def analyze_article_with_nlp(text):
+def analyze_article_with_nlp(text, doc=None):
     """
     Analyze article text using spaCy NLP
+    An already parsed spaCy `doc` for the text can be passed to avoid re-parsing
     Returns keywords found and confidence score
     """
     if not text:
         return [], 0.0
     
-    doc = nlp(text.lower())
+    if doc is None:
+        doc = nlp(text)
     
     # Extract keywords and entities
     found_keywords = []
@@ -399,52 +1103,469 @@ def analyze_article_with_nlp(text):
     
     return all_keywords, round(confidence, 2)
 
-def save_articles_to_db(articles, conn):
-    """Save articles to PostgreSQL database with deduplication"""
+def analyze_articles(texts, articles, batch_size=NLP_BATCH_SIZE):
+    """
+    Run the NLP stage for many articles with one batched spaCy pass
+    Each text is parsed once with nlp.pipe and the same Doc feeds both
+    keyword/entity scoring and country extraction
+    Returns a list of analysis dicts aligned with `texts`
+    """
+    results = []
+    docs = nlp.pipe(texts, batch_size=batch_size)
+    for text, a, doc in zip(texts, articles, docs):
+        keywords, confidence = analyze_article_with_nlp(text, doc)
+        disease_count, disease_breakdown = count_disease_mentions(text)
+        country = extract_country_from_article(text, a, a.get('url', ''), doc)
+        results.append({
+            'keywords': keywords,
+            'confidence_score': confidence,
+            'disease_mention_count': disease_count,
+            'disease_breakdown': disease_breakdown,
+            'country': country
+        })
+    return results
+
+def filter_new_articles(articles, conn):
+    """
+    Drop articles whose link is already in the articles table, plus repeats
+    of the same link within this batch, before any download or NLP work
+    All candidate links are checked with a single query
+    Returns the list of new articles in their original order
+    """
+    links = list({a.get('url') or '' for a in articles})
+    if not links:
+        return []
+    
+    cursor = conn.cursor()
+    cursor.execute("SELECT link FROM articles WHERE link = ANY(%s)", (links,))
+    known_links = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    
+    new_articles = []
+    seen_links = set()
+    for a in articles:
+        link = a.get('url') or ''
+        if link in known_links or link in seen_links:
+            continue
+        seen_links.add(link)
+        new_articles.append(a)
+    return new_articles
+
+# Columns written for each article, in insert order
+ARTICLE_COLUMNS = [
+    "title", "description", "link", "source", "published_at", "keywords",
+    "confidence_score", "disease_mention_count", "disease_breakdown", "country"
+]
+
+def article_to_row(article):
+    """Convert a processed article dict into a tuple of ARTICLE_COLUMNS values"""
+    return (
+        article['title'],
+        article['description'],
+        article['link'],
+        article['source'],
+        article['published_at'],
+        json.dumps(article['keywords']),
+        article['confidence_score'],
+        article.get('disease_mention_count', 0),
+        json.dumps(article.get('disease_breakdown', {})),
+        article.get('country')
+    )
+
+def insert_article_rows(cursor, rows, on_conflict="skip"):
+    """
+    Insert article rows with a single multi-row INSERT ... ON CONFLICT (link)
+    Returns a tuple: (inserted_count, existing_count)
+    """
+    columns = ", ".join(ARTICLE_COLUMNS)
+    if on_conflict == "update":
+        updates = ", ".join(f"{col} = EXCLUDED.{col}" for col in ARTICLE_COLUMNS if col != "link")
+        conflict_clause = f"DO UPDATE SET {updates} RETURNING (xmax = 0)"
+    else:
+        conflict_clause = "DO NOTHING RETURNING TRUE"
+    
+    returned = execute_values(
+        cursor,
+        f"INSERT INTO articles ({columns}) VALUES %s ON CONFLICT (link) {conflict_clause}",
+        rows,
+        page_size=len(rows),
+        fetch=True
+    )
+    # DO NOTHING only returns inserted rows; DO UPDATE returns every row and
+    # xmax = 0 marks the ones that were freshly inserted
+    inserted = sum(1 for (is_new,) in returned if is_new)
+    return inserted, len(rows) - inserted
+
+def save_articles_to_db(articles, conn, batch_size=DB_BATCH_SIZE, on_conflict=DB_CONFLICT_POLICY):
+    """
+    Save articles to PostgreSQL database with deduplication
+    Articles are written in batches via execute_values with ON CONFLICT (link),
+    and each batch is committed on its own so a failure only affects that batch
+    on_conflict: "skip" leaves already stored links untouched, "update" overwrites them
+    Returns a tuple: (inserted_count, skipped_count)
+    """
     if not articles:
         print("No articles to save")
-        return
+        return 0, 0
+    
+    # Drop duplicate links within this run (a row can't be upserted twice in one statement)
+    rows = []
+    seen_links = set()
+    for article in articles:
+        if article['link'] in seen_links:
+            continue
+        seen_links.add(article['link'])
+        rows.append(article_to_row(article))
     
     cursor = conn.cursor()
     saved_count = 0
-    skipped_count = 0
+    skipped_count = len(articles) - len(rows)
+    failed_count = 0
     
-    for article in articles:
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
         try:
-            # Check if article already exists (by link)
-            cursor.execute("SELECT id FROM articles WHERE link = %s", (article['link'],))
-            if cursor.fetchone():
-                skipped_count += 1
-                continue
-            
-            # Insert new article
-            cursor.execute("""
-                INSERT INTO articles (title, description, link, source, published_at, keywords, confidence_score, disease_mention_count, disease_breakdown, country)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """, (
-                article['title'],
-                article['description'],
-                article['link'],
-                article['source'],
-                article['published_at'],
-                json.dumps(article['keywords']),
-                article['confidence_score'],
-                article.get('disease_mention_count', 0),
-                json.dumps(article.get('disease_breakdown', {})),
-                article.get('country')
-            ))
-            saved_count += 1
+            inserted, existing = insert_article_rows(cursor, batch, on_conflict)
+            conn.commit()
+            saved_count += inserted
+            skipped_count += existing
         except Exception as e:
-            print(f"Error saving article {article.get('link', 'unknown')}: {e}")
             conn.rollback()
-            continue
+            print(f"Error saving batch of {len(batch)} articles ({e}); retrying one by one")
+            # Isolate the bad row(s) so the rest of the batch still gets saved
+            for row in batch:
+                try:
+                    inserted, existing = insert_article_rows(cursor, [row], on_conflict)
+                    conn.commit()
+                    saved_count += inserted
+                    skipped_count += existing
+                except Exception as row_error:
+                    conn.rollback()
+                    failed_count += 1
+                    print(f"Error saving article {row[2]}: {row_error}")
     
-    conn.commit()
     cursor.close()
-    print(f"✓ Saved {saved_count} new articles. Skipped {skipped_count} duplicates.")
+    existing_label = "updated existing" if on_conflict == "update" else "skipped duplicates"
+    print(f"✓ Saved {saved_count} new articles. {skipped_count} {existing_label}."
+          + (f" {failed_count} failed." if failed_count else ""))
+    return saved_count, skipped_count
+
+def is_health_relevant(article):
+    """Check an article's title and description for health-related terms"""
+    text = ((article.get('title') or '') + (article.get('description') or '')).lower()
+    return any(term in text for term in relevant_terms)
+
+def build_article_text(article, full_content=None):
+    """Text used for analysis: title and description, plus the full content when available"""
+    article_text = f"{article.get('title', '')} {article.get('description', '')}"
+    if full_content:
+        article_text = f"{article_text} {full_content}"
+    return article_text
+
+def build_processed_article(article, analysis):
+    """Combine a NewsAPI article with its NLP analysis into a row for save_articles_to_db"""
+    return {
+        'title': article.get('title', ''),
+        'description': article.get('description', ''),
+        'link': article.get('url', ''),
+        'source': (article.get('source') or {}).get('name', ''),
+        'published_at': parse_published_at(article),
+        **analysis
+    }
+
+def queue_put(q, item, stop):
+    """Put an item on a bounded queue, waiting for space unless the pipeline is stopping"""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+def queue_get_batch(q, max_items, stop, linger=0.2):
+    """
+    Take up to `max_items` from a queue: block for the first item, then keep
+    collecting while more arrive within `linger` seconds
+    Returns a tuple: (items, finished) where finished means the end-of-stream
+    marker (None) was reached or the pipeline is stopping
+    """
+    items = []
+    while not stop.is_set():
+        try:
+            item = q.get(timeout=linger if items else 0.5)
+        except queue.Empty:
+            if items:
+                return items, False
+            continue
+        if item is None:
+            return items, True
+        items.append(item)
+        if len(items) >= max_items:
+            return items, False
+    return items, True
+
+def run_ingestion_pipeline(conn, queries, cursors, limiter, workers=NLP_WORKERS, run=None):
+    """
+    Stream articles through query -> filter -> download -> NLP -> DB writer
+    Stages run concurrently and are connected by bounded queues, so memory stays
+    flat however many articles a run covers, network and CPU work overlap, and
+    the writer commits every DB_COMMIT_EVERY articles (a crash only loses the
+    articles still in flight)
+    - query/filter: NewsAPI queries on NEWSAPI_QUERY_WORKERS threads; each page is
+      relevance-filtered, deduplicated and checked against stored links
+    - download: FETCH_WORKERS threads fed by a HostScheduler (per-host limits);
+      fresh article-cache hits skip it
+    - NLP: batches of NLP_CHUNK_SIZE through analyze_articles, in-process or on
+      `workers` processes
+    - writer: save_articles_to_db on a separate connection (runs in this thread)
+    With `run` (an IngestionRun) every stage checkpoints its progress, and the
+    unfinished work of a resumed run is fed back in before any new queries
+    Returns a tuple: (stats, newest_by_query, ok) where ok is False if any stage failed
+    """
+    stop = threading.Event()
+    errors = []
+    stats = {'results': 0, 'relevant': 0, 'known': 0, 'cached': 0, 'downloaded': 0,
+             'analyzed': 0, 'saved': 0, 'skipped': 0}
+    stats_lock = threading.Lock()
+    db_lock = threading.Lock()
+    seen_links = set()
+    newest_by_query = {}
+    if run:
+        seen_links.update(a.get('url') or '' for _, a, _ in run.progress)
+        newest_by_query.update({q: newest for q, newest in run.completed_queries.items() if newest})
+    
+    scheduler = HostScheduler(stop=stop)
+    nlp_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    write_q = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    
+    def fail(stage, e):
+        errors.append(f"{stage}: {e}")
+        print(f"❌ {stage} stage failed: {e}")
+        stop.set()
+    
+    def count(key, n=1):
+        with stats_lock:
+            stats[key] += n
+    
+    # ---- Query + filter stage ----
+    def accept_page(page_articles):
+        if stop.is_set():
+            return False
+        count('results', len(page_articles))
+        candidates = []
+        with stats_lock:
+            for a in page_articles:
+                link = a.get('url') or ''
+                if link in seen_links or not is_health_relevant(a):
+                    continue
+                seen_links.add(link)
+                candidates.append(a)
+        count('relevant', len(candidates))
+        
+        # Skip links that are already stored so they aren't downloaded and analyzed again
+        if candidates and SKIP_KNOWN_LINKS and DB_CONFLICT_POLICY != "update":
+            with db_lock:
+                try:
+                    new_articles = filter_new_articles(candidates, conn)
+                except Exception as e:
+                    conn.rollback()
+                    print(f"⚠ Could not check for already stored articles, processing all: {e}")
+                    new_articles = candidates
+            count('known', len(candidates) - len(new_articles))
+            candidates = new_articles
+        
+        if run:
+            run.record("queued", [(a, None) for a in candidates])
+        return all(route(a) for a in candidates)
+    
+    def route(a):
+        # Fresh cache hits (and everything when offline) skip the download stage
+        url = a.get('url') or ''
+        entry = article_cache.get(url) if article_cache and url else None
+        if not url or ARTICLE_CACHE_OFFLINE or (entry and entry['fresh']):
+            if entry:
+                count('cached')
+            return queue_put(nlp_q, (a, entry['content'] if entry else None, 0.0), stop)
+        return scheduler.put(urlparse(url).netloc.lower(), a)
+    
+    def resume_stage():
+        # Unfinished articles of the resumed run re-enter at the stage they reached
+        pending = {stage: [] for stage in IngestionRun.STAGES}
+        for stage, a, analysis in run.progress:
+            pending[stage].append((a, analysis))
+        print(f"↻ Resuming run {run.run_id}: {len(run.completed_queries)} of {len(queries)} queries done, "
+              + ", ".join(f"{len(items)} {stage}" for stage, items in pending.items()))
+        for a, analysis in pending["analyzed"]:
+            if not queue_put(write_q, (a, analysis), stop):
+                return
+        for a, _ in pending["fetched"]:
+            # Downloaded (or given up on) before: use whatever the cache holds, never re-download
+            entry = article_cache.get(a['url']) if article_cache else None
+            if entry:
+                count('cached')
+            if not queue_put(nlp_q, (a, entry['content'] if entry else None, 0.0), stop):
+                return
+        for a, _ in pending["queued"]:
+            if not route(a):
+                return
+    
+    def run_query(query):
+        print(f"[{datetime.now()}] Fetching with query: {query[:80]}...")
+        newest = []
+        
+        def on_page(page_articles):
+            newest.extend(filter(None, (parse_published_at(a) for a in page_articles[:1])))
+            return accept_page(page_articles)
+        
+        _, ok = fetch_newsapi_articles(query, since=cursors.get(query), limiter=limiter, on_page=on_page)
+        newest = max(newest, default=None)
+        if ok and run:
+            run.complete_query(query, newest)
+        return ok, newest
+    
+    def query_stage():
+        try:
+            if run and run.resumed:
+                resume_stage()
+            todo = [q for q in queries if not run or q not in run.completed_queries]
+            with ThreadPoolExecutor(max_workers=max(1, min(NEWSAPI_QUERY_WORKERS, len(todo) or 1))) as executor:
+                for query, (ok, newest) in zip(todo, executor.map(run_query, todo)):
+                    if ok and newest:
+                        newest_by_query[query] = newest
+        except Exception as e:
+            fail("query", e)
+        finally:
+            scheduler.close()
+    
+    # ---- Download stage ----
+    def download_worker():
+        try:
+            while True:
+                job = scheduler.get()
+                if job is None:
+                    return
+                host, a = job
+                url = a.get('url')
+                started = time.perf_counter()
+                try:
+                    content = fetch_article_content(url)
+                except Exception as e:
+                    print(f"  ⚠ Error fetching article content from {url[:60]}: {e}")
+                    content = None
+                finally:
+                    scheduler.done(host)
+                elapsed = time.perf_counter() - started
+                if content:
+                    count('downloaded')
+                    print(f"  ✓ [{elapsed:.2f}s] Fetched {len(content)} characters from {url[:60]}")
+                else:
+                    print(f"  ⚠ [{elapsed:.2f}s] Could not fetch full content from {url[:60]}")
+                if not queue_put(nlp_q, (a, content, elapsed), stop):
+                    return
+        except Exception as e:
+            fail("download", e)
+    
+    def download_stage():
+        threads = [threading.Thread(target=download_worker, daemon=True) for _ in range(max(1, FETCH_WORKERS))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # The query stage has finished too (the scheduler only drains once it closes)
+        queue_put(nlp_q, None, stop)
+    
+    # ---- NLP stage ----
+    def emit(batch, analyses):
+        for (a, content, elapsed), analysis in zip(batch, analyses):
+            count('analyzed')
+            disease_breakdown = analysis['disease_breakdown']
+            print(f"Analyzed: {a.get('title', '')[:60]}... | "
+                  f"{analysis['disease_mention_count']} disease mentions | country: {analysis['country'] or 'None'}")
+            if disease_breakdown:
+                print(f"  Disease breakdown: {', '.join([f'{k}: {v}' for k, v in disease_breakdown.items()])}")
+            if not queue_put(write_q, (a, analysis), stop):
+                return
+    
+    def nlp_stage():
+        # Spawned, not forked: the query/download threads are already running and
+        # may hold locks (article cache, connection pools, stdout) a fork would
+        # copy in their locked state. Each worker loads the spaCy model once on import
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) if workers > 1 else None
+        in_flight = deque()
+        try:
+            finished = False
+            while not finished:
+                batch, finished = queue_get_batch(nlp_q, max(1, NLP_CHUNK_SIZE), stop)
+                if not batch:
+                    continue
+                if run:
+                    run.record("fetched", [(a, None) for a, _, _ in batch])
+                texts = [build_article_text(a, content) for a, content, _ in batch]
+                articles = [a for a, _, _ in batch]
+                if executor is None:
+                    emit(batch, analyze_articles(texts, articles))
+                    continue
+                in_flight.append((batch, executor.submit(analyze_articles, texts, articles)))
+                # Keep up to two chunks per worker in flight; hand results on in submission order
+                while in_flight and (len(in_flight) > 2 * workers or in_flight[0][1].done()):
+                    done_batch, future = in_flight.popleft()
+                    emit(done_batch, future.result())
+            while in_flight and not stop.is_set():
+                done_batch, future = in_flight.popleft()
+                emit(done_batch, future.result())
+            queue_put(write_q, None, stop)
+        except Exception as e:
+            fail("NLP", e)
+        finally:
+            if executor:
+                executor.shutdown(cancel_futures=True)
+    
+    stages = [threading.Thread(target=target, daemon=True) for target in (query_stage, download_stage, nlp_stage)]
+    for t in stages:
+        t.start()
+    
+    # ---- DB writer (this thread) ----
+    writer_conn = None
+    buffer = []
+    try:
+        writer_conn = get_db_connection()
+        finished = False
+        while not finished:
+            batch, finished = queue_get_batch(write_q, DB_COMMIT_EVERY, stop, linger=1.0)
+            if run:
+                run.record("analyzed", batch)
+            buffer.extend(batch)
+            # On a failure elsewhere, still store what was already processed
+            if buffer and (len(buffer) >= DB_COMMIT_EVERY or finished):
+                saved, skipped = save_articles_to_db(
+                    [build_processed_article(a, analysis) for a, analysis in buffer], writer_conn
+                )
+                count('saved', saved)
+                count('skipped', skipped)
+                if run:
+                    run.record("saved", [(a, None) for a, _ in buffer])
+                buffer = []
+    except Exception as e:
+        fail("writer", e)
+    finally:
+        stop.set()
+        for t in stages:
+            t.join()
+        if writer_conn:
+            writer_conn.close()
+    
+    return stats, newest_by_query, not errors
 
-def fetch_and_save_news():
-    """Fetch news articles, analyze with NLP, and save to database"""
+def fetch_and_save_news(workers=NLP_WORKERS, resume=True):
+    """
+    Fetch news articles, analyze with NLP, and save to database
+    `workers` > 1 runs the NLP stage in that many worker processes
+    Progress is checkpointed per article; an interrupted run is resumed by the
+    next call unless `resume` is False
+    """
     if not DATABASE_URL:
         print("❌ ERROR: DATABASE_URL environment variable is not set")
         print("   Please set it in your .env file or environment variables")
@@ -459,112 +1580,75 @@ def fetch_and_save_news():
         print(f"❌ Database connection error: {e}")
         return
     
-    all_results = []
-    for disease_group in groups:
-        diseases_or = " OR ".join(disease_group)
-        query = f"({diseases_or}) AND ({context_terms}) {exclude_terms}"
-        url = (
-            f'https://newsapi.org/v2/everything'
-            f'?q={query}'
-            f'&language=en'
-            f'&sortBy=publishedAt'
-            f'&pageSize=100'
-            f'&apiKey={API_KEY}'
-        )
-        print(f"[{datetime.now()}] Fetching with query: {query[:80]}...")
-        try:
-            response = requests.get(url)
-            data = response.json()
-            if 'articles' in data:
-                all_results.extend(data['articles'])
-            else:
-                print("Error or no articles returned:", data)
-        except Exception as e:
-            print(f"Error fetching news: {e}")
-            continue
-
-    # Post-filter for health relevance
-    relevant_terms = [
-        "outbreak", "cases", "hospital", "disease", "ICU", "virus", "infection",
-        "symptoms", "diagnosed", "CDC", "WHO", "sick", "illness", "health alert", "quarantine", "epidemic"
-    ]
-    filtered = [
-        a for a in all_results
-        if any(
-            term in ((a.get('title') or '') + (a.get('description') or '')).lower()
-            for term in relevant_terms
-        )
-    ]
-
-    print(f"Total filtered relevant articles: {len(filtered)}")
+    # Per-query cursors: only ask NewsAPI for what we haven't ingested yet
+    try:
+        cursors = load_query_cursors(conn)
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠ Could not load NewsAPI cursors, fetching latest pages: {e}")
+        cursors = {}
     
-    # Process articles with NLP
-    processed_articles = []
-    total_articles = len(filtered)
+    # Shared NewsAPI rate limit and daily quota (counting earlier runs today)
+    quota_day = datetime.now(timezone.utc).date()
+    try:
+        used_today = load_quota_used(conn, quota_day)
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠ Could not load NewsAPI quota usage: {e}")
+        used_today = 0
+    limiter = NewsApiLimiter(used_today=used_today)
+    print(f"NewsAPI quota: {limiter.remaining} of {NEWSAPI_DAILY_QUOTA} requests left today")
     
-    for idx, a in enumerate(filtered, 1):
-        print(f"Processing article {idx}/{total_articles}: {a.get('title', '')[:60]}...")
-        
-        # Start with title and description
-        article_text = f"{a.get('title', '')} {a.get('description', '')}"
-        
-        # Try to fetch full article content
-        article_url = a.get('url', '')
-        full_content = None
-        if article_url:
-            try:
-                print(f"  Fetching full article content from {article_url[:60]}...")
-                full_content = fetch_article_content(article_url)
-                if full_content:
-                    # Combine with title/description for better analysis
-                    article_text = f"{article_text} {full_content}"
-                    print(f"  ✓ Fetched {len(full_content)} characters of content")
-                else:
-                    print(f"  ⚠ Could not fetch full content, using title/description only")
-            except Exception as e:
-                print(f"  ⚠ Error fetching article content: {e}")
-            # Small delay to avoid rate limiting
-            time.sleep(0.5)
-        
-        # Analyze with spaCy
-        keywords, confidence = analyze_article_with_nlp(article_text)
-        
-        # Count disease mentions (now with full article content if available)
-        disease_count, disease_breakdown = count_disease_mentions(article_text)
-        print(f"  Disease mentions found: {disease_count} total")
-        if disease_breakdown:
-            print(f"  Disease breakdown: {', '.join([f'{k}: {v}' for k, v in disease_breakdown.items()])}")
-        
-        # Extract country/geolocation (now with full article content if available)
-        country = extract_country_from_article(article_text, a, article_url)
-        print(f"  Country extracted: {country if country else 'None'}")
-        
-        # Parse published date
-        published_at = None
-        try:
-            published_at = datetime.fromisoformat(a.get('publishedAt', '').replace('Z', '+00:00'))
-        except:
-            pass
-        
-        processed_articles.append({
-            'title': a.get('title', ''),
-            'description': a.get('description', ''),
-            'link': article_url,
-            'source': a.get('source', {}).get('name', ''),
-            'published_at': published_at,
-            'keywords': keywords,
-            'confidence_score': confidence,
-            'disease_mention_count': disease_count,
-            'disease_breakdown': disease_breakdown,
-            'country': country
-        })
+    try:
+        run = IngestionRun.start(resume=resume)
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠ Could not record the ingestion run, continuing without checkpoints: {e}")
+        run = None
+    
+    queries = [build_group_query(disease_group) for disease_group in groups]
+    started = time.perf_counter()
+    stats, newest_by_query, ok = run_ingestion_pipeline(conn, queries, cursors, limiter, workers=workers, run=run)
     
-    print(f"\n✓ Finished processing {len(processed_articles)} articles")
+    try:
+        record_quota_used(conn, quota_day, limiter.used)
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠ Could not record NewsAPI quota usage: {e}")
     
-    # Save to database
-    save_articles_to_db(processed_articles, conn)
+    # Advance the cursors only when every stage finished and the articles are stored
+    if ok:
+        try:
+            save_query_cursors(conn, newest_by_query)
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠ Could not save NewsAPI cursors: {e}")
+    else:
+        print("⚠ Run did not complete; NewsAPI cursors were not advanced (the next run resumes it)")
+    if run:
+        try:
+            run.finish("completed" if ok else "failed")
+        except Exception as e:
+            print(f"⚠ Could not update the ingestion run record: {e}")
+    
+    if article_cache:
+        evicted = article_cache.evict()
+        if evicted:
+            print(f"✓ Evicted {evicted} entries from the article cache")
     conn.close()
-    print(f"✓ Processed {len(processed_articles)} articles with NLP analysis")
+    
+    print(f"\n✓ {stats['results']} NewsAPI results, {stats['relevant']} relevant, "
+          f"{stats['known']} already stored")
+    print(f"✓ {stats['cached']} from cache, {stats['downloaded']} downloaded, "
+          f"{stats['analyzed']} analyzed with NLP")
+    print(f"✓ Saved {stats['saved']} new articles ({stats['skipped']} skipped) "
+          f"in {time.perf_counter() - started:.1f}s")
 
 if __name__ == "__main__":
-    fetch_and_save_news()
+    ap = argparse.ArgumentParser(description="Fetch disease news, analyze with NLP and save to the database")
+    ap.add_argument("--workers", type=int, default=NLP_WORKERS,
+                    help="NLP worker processes for large backlogs (1 = in-process)")
+    ap.add_argument("--fresh", action="store_true",
+                    help="Start a new run instead of resuming an interrupted one")
+    args = ap.parse_args()
+    fetch_and_save_news(workers=args.workers, resume=not args.fresh)